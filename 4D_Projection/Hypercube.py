@@ -1,52 +1,169 @@
+import argparse
+import ctypes
+import os
+import sys
+import time
 import numpy as np
 from PyQt5 import QtWidgets, QtCore
 from OpenGL.GL import *
+from OpenGL.GL.shaders import compileProgram, compileShader
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
+from polytopes import SHAPES, MIN_DIMENSION, MAX_DIMENSION, polytope, reduce_to_4d
+
+# Общие для визуализаторов модули лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from frame_profiler import FrameProfiler
+
+
+# Плоскость, на которую прижимается тень (в системе координат куба)
+SHADOW_PLANE_Y = -3.0
+
+# Скорости анимации в единицах за секунду
+ANGLE_SPEED = 120.0
+POSITION_SPEED = 60.0
+CAMERA_SPEED = 30.0
+SCALE_SPEED = 0.6
+
+# Длительность кадра без vsync и максимальный шаг анимации после задержки
+TARGET_FRAME_TIME = 1 / 60
+MAX_FRAME_TIME = 0.1
+
+# Шейдер повторяет rotation_matrix_4d и project_vertices на GPU
+PROJECTION_VERTEX_SHADER = """
+#version 120
+attribute vec4 position;
+uniform float theta;
+uniform float phi;
+uniform bool flatten;
+uniform float ground_y;
+
+void main() {
+    float ct = cos(theta), st = sin(theta);
+    float cp = cos(phi), sp = sin(phi);
+    vec4 p = position;
+    vec4 rotated = vec4(
+        ct * cp * p.x - st * p.y - sp * p.z,
+        st * p.x + ct * cp * p.y - sp * p.w,
+        ct * p.z + st * p.w,
+        sp * p.x - st * p.z + cp * p.w
+    );
+    vec3 projected = rotated.xyz * (3.0 / (4.0 - rotated.w));
+    if (flatten) {
+        projected.y = ground_y;
+    }
+    gl_FrontColor = gl_Color;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(projected, 1.0);
+}
+"""
+
+PROJECTION_FRAGMENT_SHADER = """
+#version 120
+void main() {
+    gl_FragColor = gl_Color;
+}
+"""
+
+
+class AnimationClock:
+    """
+    Монотонные часы анимации. tick() возвращает время с прошлого тика,
+    ограниченное max_dt, поэтому пропущенные кадры схлопываются в один шаг.
+    После pause() следующий тик возвращает 0.
+    """
+
+    def __init__(self, max_dt=MAX_FRAME_TIME):
+        self.max_dt = max_dt
+        self.last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        dt = 0.0 if self.last is None else min(now - self.last, self.max_dt)
+        self.last = now
+        return dt
+
+    def elapsed(self):
+        return 0.0 if self.last is None else time.perf_counter() - self.last
+
+    def pause(self):
+        self.last = None
 
 
 class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
-    def __init__(self):
+    def __init__(self, shape="cube", dimension=4):
         super().__init__()
+        self.shape = shape
+        self.dimension = dimension
         self.angle = 0
         self.position_angle = 0
         self.scale_factor = 1.0
         self.scale_direction = 1
         self.camera_angle = 0
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.update_animation)
-        self.timer.start(16)
+        self.profiler = FrameProfiler()
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+
+        # Следующий кадр запрашивается после показа текущего (frameSwapped).
+        # С vsync темп задает дисплей, без него - pacing_timer.
+        self.clock = AnimationClock()
+        self.pacing_timer = QtCore.QTimer()
+        self.pacing_timer.setSingleShot(True)
+        self.pacing_timer.timeout.connect(self.advance_animation)
+        self.frameSwapped.connect(self.on_frame_swapped)
 
         # Инициализация вершин и ребер
         self.vertices = self.generate_vertices()
         self.edges = self.generate_edges()
 
     def generate_vertices(self):
-        return np.array([
-            [-1, -1, -1, -1], [1, -1, -1, -1], [1, 1, -1, -1], [-1, 1, -1, -1],
-            [-1, -1, 1, -1], [1, -1, 1, -1], [1, 1, 1, -1], [-1, 1, 1, -1],
-            [-1, -1, -1, 1], [1, -1, -1, 1], [1, 1, -1, 1], [-1, 1, -1, 1],
-            [-1, -1, 1, 1], [1, -1, 1, 1], [1, 1, 1, 1], [-1, 1, 1, 1]
-        ], dtype=np.float32)
+        vertices, _ = polytope(self.shape, self.dimension)
+        return reduce_to_4d(vertices)
 
     def generate_edges(self):
-        return [
-            (0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6), (6, 7), (7, 4),
-            (0, 4), (1, 5), (2, 6), (3, 7), (8, 9), (9, 10), (10, 11), (11, 8),
-            (12, 13), (13, 14), (14, 15), (15, 12), (8, 12), (9, 13), (10, 14), (11, 15),
-            (0, 8), (1, 9), (2, 10), (3, 11), (4, 12), (5, 13), (6, 14), (7, 15)
-        ]
-
-    def update_animation(self):
-        self.angle += 2
-        self.position_angle += 1
-        self.camera_angle += 0.5
+        _, edges = polytope(self.shape, self.dimension)
+        return edges
+
+    def keyPressEvent(self, event):
+        if event.key() == QtCore.Qt.Key_F3:
+            self.profiler.toggle_overlay()
+            self.update()
+        else:
+            super().keyPressEvent(event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.clock.pause()
+        self.update()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.pacing_timer.stop()
+        self.clock.pause()
+
+    def on_frame_swapped(self):
+        if not self.isVisible() or self.window().isMinimized():
+            self.clock.pause()
+            return
+
+        if self.context().format().swapInterval() >= 1:
+            self.advance_animation()
+        else:
+            remaining = max(TARGET_FRAME_TIME - self.clock.elapsed(), 0.0)
+            # Повторный start перезапускает таймер, лишние кадры не накапливаются
+            self.pacing_timer.start(int(remaining * 1000))
+
+    def advance_animation(self):
+        self.update_animation(self.clock.tick())
+
+    def update_animation(self, dt=TARGET_FRAME_TIME):
+        self.angle += ANGLE_SPEED * dt
+        self.position_angle += POSITION_SPEED * dt
+        self.camera_angle += CAMERA_SPEED * dt
 
         if self.scale_factor >= 1.5:
             self.scale_direction = -1
         elif self.scale_factor <= 0.8:
             self.scale_direction = 1
-        self.scale_factor += 0.01 * self.scale_direction
+        self.scale_factor += SCALE_SPEED * dt * self.scale_direction
 
         self.update()
 
@@ -74,6 +191,59 @@ class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
         glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
         glLightfv(GL_LIGHT0, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
 
+        with self.profiler.stage("upload"):
+            self.init_buffers()
+        self.init_shader()
+
+    def init_buffers(self):
+        """
+        Загружает 4D вершины и индексы ребер в буферы один раз.
+
+        Вращение и проекция выполняются в вершинном шейдере, поэтому
+        буферы больше не обновляются от кадра к кадру.
+        """
+        vertices = np.ascontiguousarray(self.vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(self.edges.ravel(), dtype=np.uint32)
+        self.edge_index_count = indices.size
+
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def init_shader(self):
+        self.shader = compileProgram(
+            compileShader(PROJECTION_VERTEX_SHADER, GL_VERTEX_SHADER),
+            compileShader(PROJECTION_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+        )
+        self.position_location = glGetAttribLocation(self.shader, "position")
+        self.theta_location = glGetUniformLocation(self.shader, "theta")
+        self.phi_location = glGetUniformLocation(self.shader, "phi")
+        self.flatten_location = glGetUniformLocation(self.shader, "flatten")
+        self.ground_y_location = glGetUniformLocation(self.shader, "ground_y")
+
+    def draw_edges(self, shadow=False):
+        glUseProgram(self.shader)
+        glUniform1f(self.theta_location, np.radians(self.angle))
+        glUniform1f(self.phi_location, np.radians(self.angle * 2))
+        glUniform1i(self.flatten_location, int(shadow))
+        glUniform1f(self.ground_y_location, SHADOW_PLANE_Y)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glEnableVertexAttribArray(self.position_location)
+        glVertexAttribPointer(self.position_location, 4, GL_FLOAT, GL_FALSE, 0, None)
+        glDrawElements(GL_LINES, self.edge_index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glDisableVertexAttribArray(self.position_location)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
     def resizeGL(self, w, h):
         glViewport(0, 0, w, h)
         glMatrixMode(GL_PROJECTION)
@@ -82,17 +252,24 @@ class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
         glMatrixMode(GL_MODELVIEW)
 
     def paintGL(self):
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
+        self.profiler.mark_frame()
+        with self.profiler.stage("paintGL"):
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()
+
+            glTranslatef(0.0, 0.0, -15)
+            glRotatef(self.camera_angle, 0, 1, 0)
 
-        glTranslatef(0.0, 0.0, -15)
-        glRotatef(self.camera_angle, 0, 1, 0)
+            with self.profiler.stage("ground"):
+                self.draw_ground_plane()
+            with self.profiler.stage("hypercube"):
+                self.draw_hypercube()
+            with self.profiler.stage("shadow"):
+                self.draw_shadow()
 
-        self.draw_ground_plane()
-        self.draw_hypercube()
-        self.draw_shadow()
+            glFlush()
 
-        glFlush()
+        self.profiler.draw_overlay(self)
 
     def draw_hypercube(self):
         radius = 5.0
@@ -104,18 +281,10 @@ class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
         glRotatef(self.angle, 1, 1, 0)
         glScalef(self.scale_factor, self.scale_factor, self.scale_factor)
 
-        # 4D вращение
-        rotation_matrix = self.rotation_matrix_4d()
-        projected_vertices = [self.project_vertex(v, rotation_matrix) for v in self.vertices]
-
         # Отрисовка ребер
         glColor3f(0.2, 0.2, 0.8)
         glLineWidth(2.0)
-        glBegin(GL_LINES)
-        for edge in self.edges:
-            for idx in edge:
-                glVertex3fv(projected_vertices[idx][:3].astype(np.float32).tobytes())
-        glEnd()
+        self.draw_edges()
 
         glPopMatrix()
 
@@ -132,16 +301,7 @@ class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
         glTranslatef(x, 0.0, z)
         glRotatef(self.angle, 1, 1, 0)
 
-        rotation_matrix = self.rotation_matrix_4d()
-        projected_vertices = [self.project_vertex(v, rotation_matrix) for v in self.vertices]
-
-        glBegin(GL_LINES)
-        for edge in self.edges:
-            for idx in edge:
-                vert = projected_vertices[idx].copy()
-                vert[1] = -3.0
-                glVertex3fv(vert[:3].astype(np.float32).tobytes())
-        glEnd()
+        self.draw_edges(shadow=True)
 
         glDisable(GL_BLEND)
         glPopMatrix()
@@ -171,22 +331,39 @@ class HypercubeVisualizer(QtWidgets.QOpenGLWidget):
         ], dtype=np.float32)
 
     def project_vertex(self, vertex, rotation_matrix):
-        rotated = np.dot(rotation_matrix, vertex)
-        perspective = 3.0 / (4.0 - rotated[3])
-        return rotated[:3] * perspective
+        return self.project_vertices(np.asarray(vertex)[np.newaxis], rotation_matrix)[0]
+
+    def project_vertices(self, vertices, rotation_matrix):
+        """
+        Проецирует массив 4D точек формы (N, 4) в 3D одним матричным умножением.
+
+        Возвращает массив float32 формы (N, 3).
+        """
+        rotated = np.asarray(vertices, dtype=np.float32) @ rotation_matrix.T
+        perspective = 3.0 / (4.0 - rotated[:, 3])
+        return np.ascontiguousarray(rotated[:, :3] * perspective[:, np.newaxis], dtype=np.float32)
 
 
 class HypercubeApp(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, shape="cube", dimension=4):
         super().__init__()
-        self.setWindowTitle("4D Hypercube Visualization (Fixed)")
+        self.setWindowTitle(f"{dimension}D {shape} Visualization")
         self.setGeometry(100, 100, 800, 600)
-        self.visualizer = HypercubeVisualizer()
+        self.visualizer = HypercubeVisualizer(shape, dimension)
         self.setCentralWidget(self.visualizer)
 
 
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    window = HypercubeApp()
+    parser = argparse.ArgumentParser(description='Визуализация многомерных многогранников.')
+    parser.add_argument('--shape', choices=SHAPES, default='cube', help='Тип многогранника.')
+    parser.add_argument('--dimension', type=int, default=4, choices=range(MIN_DIMENSION, MAX_DIMENSION + 1),
+                        metavar=f'{{{MIN_DIMENSION}..{MAX_DIMENSION}}}', help='Размерность пространства.')
+    parser.add_argument('--profile', type=str, help='Сохранить статистику кадров при выходе (.json или .csv).')
+    args, qt_args = parser.parse_known_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    window = HypercubeApp(args.shape, args.dimension)
+    if args.profile:
+        app.aboutToQuit.connect(lambda: window.visualizer.profiler.dump(args.profile))
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,182 @@
+import argparse
+import ctypes
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# Без дисплея Qt должен работать на offscreen-платформе
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5 import QtGui, QtWidgets
+from OpenGL.GL import *
+from Hypercube import HypercubeVisualizer
+from polytopes import SHAPES, MIN_DIMENSION, MAX_DIMENSION
+
+
+class FrameWriter:
+    """
+    Пишет кадры в фоновом потоке, чтобы диск или пайп не тормозили рендер.
+
+    Кадры принимаются снизу вверх (как их отдает glReadPixels) и переворачиваются при записи.
+    """
+
+    def __init__(self, width, height, output, fps=60, queue_size=8):
+        self.width = width
+        self.height = height
+        self.output = output
+        self.fps = fps
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.process = None
+        self.stream = None
+        self.frame_index = 0
+
+        if output == "-":
+            self.stream = sys.stdout.buffer
+        elif output.endswith((".mp4", ".mkv", ".webm", ".gif")):
+            self.process = subprocess.Popen([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24",
+                "-s", f"{width}x{height}", "-r", str(fps),
+                "-i", "-", output,
+            ], stdin=subprocess.PIPE)
+            self.stream = self.process.stdin
+        else:
+            os.makedirs(output, exist_ok=True)
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        self.frames.put(frame)
+
+    def close(self):
+        self.frames.put(None)
+        self.thread.join()
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+        elif self.stream is not None:
+            self.stream.flush()
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+
+            pixels = np.frombuffer(frame, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+            if self.stream is not None:
+                self.stream.write(pixels.tobytes())
+            else:
+                path = os.path.join(self.output, f"frame_{self.frame_index:06d}.ppm")
+                with open(path, "wb") as f:
+                    f.write(f"P6\n{self.width} {self.height}\n255\n".encode())
+                    f.write(pixels.tobytes())
+            self.frame_index += 1
+
+
+class HeadlessRenderer:
+    """
+    Рендерит HypercubeVisualizer во внеэкранный фреймбуфер с фиксированным шагом анимации.
+
+    Чтение пикселей асинхронное: glReadPixels пишет в кольцо PBO,
+    а на CPU забирается кадр, отрендеренный pbo_count - 1 кадров назад.
+    """
+
+    def __init__(self, width=800, height=600, shape="cube", dimension=4, pbo_count=3):
+        self.width = width
+        self.height = height
+        self.pbo_count = pbo_count
+        self.frame_size = width * height * 3
+
+        surface_format = QtGui.QSurfaceFormat()
+        surface_format.setDepthBufferSize(24)
+
+        self.context = QtGui.QOpenGLContext()
+        self.context.setFormat(surface_format)
+        if not self.context.create():
+            raise RuntimeError("Не удалось создать OpenGL контекст")
+
+        self.surface = QtGui.QOffscreenSurface()
+        self.surface.setFormat(self.context.format())
+        self.surface.create()
+        self.context.makeCurrent(self.surface)
+
+        self.fbo = QtGui.QOpenGLFramebufferObject(
+            width, height, QtGui.QOpenGLFramebufferObject.CombinedDepthStencil
+        )
+
+        # Виджет не показывается, поэтому сам анимацию не продвигает
+        self.visualizer = HypercubeVisualizer(shape, dimension)
+
+        self.fbo.bind()
+        self.visualizer.initializeGL()
+        self.visualizer.resizeGL(width, height)
+
+        self.pbos = glGenBuffers(pbo_count)
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+
+    def render(self, frame_count, writer, fps=60):
+        """Рендерит frame_count кадров с шагом анимации 1 / fps и передает их в writer."""
+        for frame in range(frame_count):
+            self.visualizer.update_animation(1.0 / fps)
+            self.visualizer.paintGL()
+
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[frame % self.pbo_count])
+            glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+
+            if frame >= self.pbo_count - 1:
+                writer.write(self.read_pbo(frame - self.pbo_count + 1))
+
+        # Забираем кадры, оставшиеся в кольце
+        for frame in range(max(frame_count - self.pbo_count + 1, 0), frame_count):
+            writer.write(self.read_pbo(frame))
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def read_pbo(self, frame):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[frame % self.pbo_count])
+        pointer = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        data = ctypes.string_at(pointer, self.frame_size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        return data
+
+    def close(self):
+        glDeleteBuffers(self.pbo_count, self.pbos)
+        self.fbo.release()
+        self.context.doneCurrent()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Внеэкранный рендер анимации многогранника.')
+    parser.add_argument('output', type=str,
+                        help='Папка для PPM кадров, видеофайл (.mp4/.mkv/.webm/.gif, через ffmpeg) '
+                             'или "-" для сырых RGB кадров в stdout.')
+    parser.add_argument('--frames', type=int, default=600, help='Количество кадров.')
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--fps', type=int, default=60, help='Частота кадров видео.')
+    parser.add_argument('--shape', choices=SHAPES, default='cube', help='Тип многогранника.')
+    parser.add_argument('--dimension', type=int, default=4, choices=range(MIN_DIMENSION, MAX_DIMENSION + 1),
+                        metavar=f'{{{MIN_DIMENSION}..{MAX_DIMENSION}}}', help='Размерность пространства.')
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    renderer = HeadlessRenderer(args.width, args.height, args.shape, args.dimension)
+    writer = FrameWriter(args.width, args.height, args.output, fps=args.fps)
+
+    start = time.perf_counter()
+    renderer.render(args.frames, writer, fps=args.fps)
+    writer.close()
+    renderer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.frames} кадров за {elapsed:.2f} с ({args.frames / elapsed:.1f} FPS)", file=sys.stderr)
@@ -0,0 +1,167 @@
+import functools
+import itertools
+import numpy as np
+
+
+SHAPES = ("cube", "cross", "24-cell", "600-cell")
+
+# Фиксированная размерность правильных многогранников, существующих только в 4D
+FIXED_DIMENSION = {"24-cell": 4, "600-cell": 4}
+
+# Допустимые размерности куба и кросс-политопа: у n-куба 2^n вершин и n * 2^(n-1) ребер,
+# при n = 30 это десятки гигабайт
+MIN_DIMENSION = 4
+MAX_DIMENSION = 16
+
+
+@functools.lru_cache(maxsize=16)
+def polytope(shape="cube", n=4):
+    """
+    Возвращает (vertices, edges) многогранника.
+
+    Args:
+        shape: "cube" (n-мерный куб), "cross" (n-мерный кросс-политоп, в 4D - 16-cell),
+            "24-cell" или "600-cell".
+        n: Размерность пространства, от MIN_DIMENSION до MAX_DIMENSION.
+
+    Returns:
+        vertices: Массив float32 формы (V, n).
+        edges: Массив uint32 формы (E, 2) с индексами вершин.
+
+    Результаты кешируются, массивы доступны только для чтения.
+
+    Raises:
+        ValueError: неизвестная фигура или недопустимая размерность.
+    """
+    if not MIN_DIMENSION <= n <= MAX_DIMENSION:
+        raise ValueError(f"Размерность должна быть от {MIN_DIMENSION} до {MAX_DIMENSION}, получено {n}")
+    if shape in FIXED_DIMENSION and n != FIXED_DIMENSION[shape]:
+        raise ValueError(f"{shape} существует только в {FIXED_DIMENSION[shape]}D")
+
+    if shape == "cube":
+        vertices, edges = hypercube(n)
+    elif shape == "cross":
+        vertices, edges = cross_polytope(n)
+    elif shape == "24-cell":
+        vertices, edges = cell_24()
+    elif shape == "600-cell":
+        vertices, edges = cell_600()
+    else:
+        raise ValueError(f"Неизвестная фигура: {shape}. Доступны: {', '.join(SHAPES)}")
+
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    edges = np.ascontiguousarray(edges, dtype=np.uint32)
+    vertices.flags.writeable = False
+    edges.flags.writeable = False
+    return vertices, edges
+
+
+def hypercube(n):
+    """
+    Вершины n-мерного куба - все двоичные числа от 0 до 2^n - 1,
+    бит k задает знак координаты k. Ребро соединяет вершины,
+    отличающиеся ровно одним битом.
+    """
+    if n < 1:
+        raise ValueError("Размерность куба должна быть не меньше 1")
+
+    index = np.arange(1 << n, dtype=np.int64)
+    bits = np.int64(1) << np.arange(n, dtype=np.int64)
+
+    vertices = ((index[:, np.newaxis] & bits) != 0) * 2.0 - 1.0
+
+    start, axis = np.nonzero((index[:, np.newaxis] & bits) == 0)
+    edges = np.column_stack([start, start | bits[axis]])
+    return vertices, edges
+
+
+def cross_polytope(n):
+    """
+    Вершины - ±e_i в порядке +e0, -e0, +e1, -e1, ...
+    Каждая вершина соединена со всеми, кроме противоположной (индекс i ^ 1).
+    """
+    if n < 1:
+        raise ValueError("Размерность кросс-политопа должна быть не меньше 1")
+
+    vertices = np.zeros((2 * n, n))
+    axis = np.arange(2 * n) // 2
+    vertices[np.arange(2 * n), axis] = np.where(np.arange(2 * n) % 2 == 0, 1.0, -1.0)
+
+    start, end = np.triu_indices(2 * n, k=1)
+    keep = end != (start ^ 1)
+    edges = np.column_stack([start[keep], end[keep]])
+    return vertices, edges
+
+
+def cell_24():
+    """Все перестановки (±1, ±1, 0, 0), радиус приведен к 1."""
+    vertices = set()
+    for i, j in itertools.combinations(range(4), 2):
+        for si, sj in itertools.product((1.0, -1.0), repeat=2):
+            vertex = [0.0] * 4
+            vertex[i], vertex[j] = si, sj
+            vertices.add(tuple(vertex))
+    vertices = np.array(sorted(vertices)) / np.sqrt(2.0)
+    return vertices, nearest_neighbour_edges(vertices)
+
+
+def cell_600():
+    """
+    120 вершин единичного радиуса: (±1/2, ±1/2, ±1/2, ±1/2), перестановки (0, 0, 0, ±1)
+    и четные перестановки 1/2 * (±phi, ±1, ±1/phi, 0).
+    """
+    phi = (1 + np.sqrt(5)) / 2
+
+    vertices = [np.array(signs) / 2 for signs in itertools.product((1.0, -1.0), repeat=4)]
+    for axis in range(4):
+        for sign in (1.0, -1.0):
+            vertex = np.zeros(4)
+            vertex[axis] = sign
+            vertices.append(vertex)
+
+    base = np.array([phi, 1.0, 1 / phi, 0.0]) / 2
+    for permutation in itertools.permutations(range(4)):
+        if not is_even_permutation(permutation):
+            continue
+        for signs in itertools.product((1.0, -1.0), repeat=3):
+            values = base * np.array(signs + (1.0,))
+            vertices.append(values[list(permutation)])
+
+    vertices = np.array(vertices)
+    return vertices, nearest_neighbour_edges(vertices)
+
+
+def is_even_permutation(permutation):
+    inversions = sum(
+        1 for i, j in itertools.combinations(range(len(permutation)), 2)
+        if permutation[i] > permutation[j]
+    )
+    return inversions % 2 == 0
+
+
+def nearest_neighbour_edges(vertices):
+    """
+    Ребра правильного многогранника - пары вершин на минимальном расстоянии.
+    Используется только для фигур фиксированного размера (до 120 вершин).
+    """
+    squared = np.sum((vertices[:, np.newaxis, :] - vertices[np.newaxis, :, :]) ** 2, axis=-1)
+    start, end = np.triu_indices(len(vertices), k=1)
+    distances = squared[start, end]
+    keep = np.isclose(distances, distances.min())
+    return np.column_stack([start[keep], end[keep]])
+
+
+def reduce_to_4d(vertices, distance=4.0):
+    """
+    Перспективно проецирует вершины из nD в 4D, отбрасывая по одной
+    старшей координате тем же делением, что и проекция 4D -> 3D.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    if vertices.shape[1] < 4:
+        padding = np.zeros((len(vertices), 4 - vertices.shape[1]), dtype=np.float32)
+        return np.hstack([vertices, padding])
+
+    while vertices.shape[1] > 4:
+        perspective = (distance - 1.0) / (distance - vertices[:, -1])
+        vertices = vertices[:, :-1] * perspective[:, np.newaxis]
+    return np.ascontiguousarray(vertices, dtype=np.float32)
@@ -0,0 +1,134 @@
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Только расчет: matplotlib здесь не импортируется
+from conveyor_schedule import OPTIMIZED, read_config, summary_times, conveyor_load
+
+COLUMNS = ["file", "hash", "n", "m", "t", "c", "time", "busy", "idle", "utilisation",
+           "T_посл", "T_пар", "T_опт", "error"]
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла: по нему повторный запуск узнает неизмененные конфигурации."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_configs(patterns):
+    """Файлы конфигураций: каталог дает все *.csv в нем, остальное понимается как glob-шаблон."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(glob.glob(os.path.join(pattern, '*.csv')))
+        else:
+            paths.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(paths))
+
+
+def evaluate(path, content_hash):
+    """
+    Строки итоговой таблицы для одного файла: по строке на конвейер.
+
+    Загрузка и простой считаются для оптимизированной непрерывной организации
+    (с ней сравнивают линии), T_посл/T_пар/T_опт повторяются в каждой строке.
+    Ошибка разбора или расчета дает одну строку с заполненной колонкой error.
+    """
+    try:
+        goods, conveyors = read_config(path)
+        t_posl, t_par, t_opt = summary_times(goods, conveyors)
+        workers = {conveyor['m']: conveyor['c'] for conveyor in conveyors}
+        base = {conveyor['m']: conveyor['t'] for conveyor in conveyors}
+        ms, times, busy, idle, utilisation = conveyor_load(OPTIMIZED, goods, conveyors)
+    except Exception as e:
+        return [{"file": path, "hash": content_hash, "error": f"{type(e).__name__}: {e}"}]
+
+    return [
+        {
+            "file": path, "hash": content_hash, "n": goods, "m": m, "t": base[m], "c": workers[m],
+            "time": float(times[j]), "busy": float(busy[j]), "idle": float(idle[j]),
+            "utilisation": float(utilisation[j]),
+            "T_посл": t_posl, "T_пар": t_par, "T_опт": t_opt, "error": "",
+        }
+        for j, m in enumerate(ms.tolist())
+    ]
+
+
+def read_results(path):
+    """Строки прошлого запуска по файлам: {file: (hash, [строки])}; пустой словарь, если таблицы нет."""
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            previous.setdefault(row["file"], (row["hash"], []))[1].append(row)
+    return previous
+
+
+def write_results(path, rows):
+    """Пишет таблицу через временный файл, чтобы прерванный запуск не испортил прошлые результаты."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, delimiter=';', restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary, path)
+
+
+def run(patterns, output, workers=None, full=False):
+    """
+    Считает все найденные конфигурации в пуле процессов и пишет общую таблицу.
+
+    Файлы, чей хэш совпадает с записанным в прошлой таблице (и без ошибки),
+    не пересчитываются - их строки переносятся как есть, если не задан full.
+
+    Returns:
+        (посчитано, пропущено, с ошибкой)
+    """
+    paths = find_configs(patterns)
+    previous = {} if full else read_results(output)
+
+    rows = {}
+    pending = []
+    for path in paths:
+        content_hash = file_hash(path)
+        old = previous.get(path)
+        if old is not None and old[0] == content_hash and not any(row["error"] for row in old[1]):
+            rows[path] = old[1]
+        else:
+            pending.append((path, content_hash))
+
+    skipped = len(rows)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Файлы маленькие: отдаем их пулу пачками, чтобы не платить за пересылку каждого
+        chunksize = max(1, len(pending) // (4 * (workers or os.cpu_count() or 1)))
+        results = executor.map(evaluate, *zip(*pending), chunksize=chunksize) if pending else []
+        for (path, _), file_rows in zip(pending, results):
+            rows[path] = file_rows
+
+    write_results(output, [row for path in paths for row in rows[path]])
+    failed = sum(1 for path in paths if rows[path][0]["error"])
+    return len(pending), skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Пакетный расчет множества конфигураций конвейерных линий без графиков.')
+    parser.add_argument('inputs', nargs='+', help="Каталоги с *.csv или glob-шаблоны файлов с разделителем ';'.")
+    parser.add_argument('--output', type=str, default='results.csv',
+                        help="Итоговая таблица (';'), по строке на конвейер каждого файла.")
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - все ядра).')
+    parser.add_argument('--full', action='store_true', help='Пересчитать все файлы, даже неизмененные.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    computed, skipped, failed = run(args.inputs, args.output, args.workers, args.full)
+    print(f"Посчитано {computed}, пропущено без изменений {skipped}, с ошибкой {failed} "
+          f"за {time.perf_counter() - start:.1f} с; таблица в {os.path.abspath(args.output)}", file=sys.stderr)
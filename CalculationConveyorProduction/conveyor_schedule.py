@@ -0,0 +1,157 @@
+import csv
+
+import numpy as np
+
+SEQUENTIAL = "sequential"
+PARALLEL = "parallel"
+OPTIMIZED = "optimized"
+
+
+def read_config(path):
+    """
+    Читает конфигурацию линии из файла с разделителем ';'.
+
+    Строка "n;<число товаров>" и по строке на конвейер "m;<номер>;t;<время>;c;<рабочие>".
+
+    Returns:
+        (goods, conveyors): число товаров и список словарей {'m', 't', 'c'}.
+    """
+    conveyors = []
+    goods_count = 0
+
+    with open(path, 'r') as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        for row in reader:
+            row = [x for x in row if x]
+            if row:
+                if row[0] == 'n':
+                    goods_count = int(row[1])
+                elif row[0] == 'm':
+                    conveyor = {}
+                    conveyor['m'] = int(row[1])
+                    for i in range(2, len(row), 2):
+                        conveyor[row[i]] = int(row[i+1])
+                    conveyors.append(conveyor)
+
+    if not goods_count or not conveyors:
+        raise ValueError("Неверный формат входных данных. Убедитесь, что файл содержит 'n' и данные о конвейерах 'm'.")
+    return goods_count, conveyors
+
+
+def stage_times(conveyors):
+    """
+    Время одной операции на каждом конвейере с учетом рабочих (t / c, при c = 0 - бесконечность).
+
+    Конвейеры берутся в порядке m; исходные словари не меняются.
+
+    Returns:
+        ms: номера конвейеров по порядку.
+        times: float64 время операции на каждом из них.
+    """
+    ordered = sorted(conveyors, key=lambda x: x['m'])
+    ms = np.array([conveyor['m'] for conveyor in ordered])
+    t = np.array([conveyor['t'] for conveyor in ordered], dtype=float)
+    c = np.array([conveyor['c'] for conveyor in ordered], dtype=float)
+    times = np.full(len(ordered), np.inf)
+    np.divide(t, c, out=times, where=c != 0)
+    return ms, times
+
+
+def schedule_timing(kind, times, goods):
+    """
+    Расписание организации kind в замкнутой форме: начало операции товара i
+    на конвейере j равно offsets[j] + i * periods[j].
+
+    Все товары одинаковы, поэтому рекуррентности циклов сворачиваются:
+    - последовательная: конвейер j обрабатывает всю партию после предыдущих,
+      offsets = goods * (сумма времен до j), periods = times;
+    - параллельная: товар запускается после выхода предыдущего со всей линии,
+      offsets = сумма времен до j, periods = сумма всех времен;
+    - оптимизированная непрерывная: F[i, j] = max(F[i - 1, j], F[i, j - 1]) + t[j]
+      (max-plus рекуррентность) дает F[i, j] = сумма времен до j включительно
+      + i * max(t[0..j]), то есть periods - накопленный максимум (узкое место).
+
+    Память и время O(conveyors) при любом goods.
+    """
+    offsets = np.zeros(len(times))
+    np.cumsum(times[:-1], out=offsets[1:])
+    if kind == SEQUENTIAL:
+        return offsets * goods, times.copy()
+    if kind == PARALLEL:
+        return offsets, np.full(len(times), times.sum())
+    if kind == OPTIMIZED:
+        return offsets, np.maximum.accumulate(times)
+    raise ValueError(f"Неизвестная организация: {kind}")
+
+
+def fill_starts(offsets, periods, first, out):
+    """
+    Записывает начала операций товаров first .. first + len(out) - 1 в готовый массив out (k, conveyors).
+
+    Новые массивы размером с out не создаются, поэтому расписание любой длины
+    считается кусками в один и тот же буфер.
+    """
+    np.multiply.outer(np.arange(first, first + len(out), dtype=float), periods, out=out)
+    out += offsets
+    return out
+
+
+def makespan(offsets, periods, times, goods):
+    """Время окончания последней операции (T посл/пар/опт) без построения расписания."""
+    if goods == 0:
+        return 0.0
+    return float(np.max(offsets + (goods - 1) * periods + times))
+
+
+def iter_schedule(kind, goods, conveyors, chunk=65536):
+    """
+    Ленивое расписание: кусками до chunk товаров, в каждом куске - по конвейерам (в порядке m).
+
+    Yields:
+        (m, starts, length): номер конвейера, начала операций очередного куска
+        товаров и длительность каждой. starts - столбец одного и того же буфера
+        fill_starts, он перезаписывается на следующем куске (при необходимости
+        копируйте). Память O(chunk * conveyors) при любом goods.
+    """
+    ms, times = stage_times(conveyors)
+    offsets, periods = schedule_timing(kind, times, goods)
+    ms = ms.tolist()
+    buffer = np.empty((min(chunk, goods), len(ms)))
+    for first in range(0, goods, chunk):
+        starts = fill_starts(offsets, periods, first, buffer[:min(chunk, goods - first)])
+        for j, m in enumerate(ms):
+            yield m, starts[:, j], float(times[j])
+
+
+def summary_times(goods, conveyors):
+    """
+    T_посл, T_пар, T_опт по формулам calculate_times за O(conveyors) памяти при любом goods.
+    """
+    _, times = stage_times(conveyors)
+    ordered = np.sort(times)
+    t_posl = float(times.sum()) * goods
+    t_par = goods * (float(ordered[-1]) + float(ordered[0]) + float(ordered[1]))
+    t_opt = float(times.sum()) + (goods - 1) * float(ordered[-1])
+    return t_posl, t_par, t_opt
+
+
+def conveyor_load(kind, goods, conveyors):
+    """
+    Загрузка конвейеров за всё время выпуска партии при организации kind.
+
+    Returns:
+        ms: номера конвейеров.
+        times: время операции на каждом.
+        busy: суммарное время работы каждого конвейера (goods * t).
+        idle: простой каждого конвейера от начала до окончания всей партии.
+        utilisation: доля времени работы, busy / makespan.
+    """
+    ms, times = stage_times(conveyors)
+    offsets, periods = schedule_timing(kind, times, goods)
+    total = makespan(offsets, periods, times, goods)
+    busy = goods * times
+    # Конвейер без рабочих (t = inf) дает inf/nan в своих колонках, а не исключение
+    with np.errstate(invalid='ignore'):
+        idle = total - busy
+        utilisation = busy / total if total > 0 else np.zeros(len(times))
+    return ms, times, busy, idle, utilisation
@@ -0,0 +1,318 @@
+import argparse
+import heapq
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from conveyor_schedule import read_config, stage_times
+
+# Случайные числа генерируются блоками: один вызов NumPy на столько операций
+RANDOM_BLOCK = 4096
+
+
+class StationRandom:
+    """
+    Поток случайных величин одного конвейера, заранее сгенерированных блоками.
+
+    Время операции - гамма-распределение со средним mean и коэффициентом вариации cv
+    (cv = 0 - детерминированное t / c). Отказы - экспоненциальная наработка на отказ
+    mtbf (по времени работы) и экспоненциальный ремонт mttr.
+    """
+
+    def __init__(self, rng, mean, cv, mtbf, mttr):
+        self.rng = rng
+        self.mean = mean
+        self.cv = cv
+        self.mtbf = mtbf
+        self.mttr = mttr
+        self.times = []
+        self.failures = []
+        self.repairs = []
+
+    def processing_time(self):
+        if not self.times:
+            if self.cv > 0:
+                shape = 1 / self.cv ** 2
+                self.times = self.rng.gamma(shape, self.mean / shape, RANDOM_BLOCK).tolist()
+            else:
+                self.times = [self.mean] * RANDOM_BLOCK
+        return self.times.pop()
+
+    def time_to_failure(self):
+        if not self.failures:
+            self.failures = self.rng.exponential(self.mtbf, RANDOM_BLOCK).tolist()
+        return self.failures.pop()
+
+    def repair_time(self):
+        if not self.repairs:
+            self.repairs = self.rng.exponential(self.mttr, RANDOM_BLOCK).tolist()
+        return self.repairs.pop()
+
+
+def simulate(times, buffer_size, shift, warmup, seed, cv=0.0, mtbf=0.0, mttr=0.0):
+    """
+    Одна реализация смены линии из последовательных конвейеров.
+
+    Перед первым конвейером заготовок всегда достаточно, после последнего место
+    не ограничено. Между конвейерами буферы на buffer_size товаров. Закончив
+    операцию, конвейер отдает товар следующему (сразу на обработку или в буфер),
+    а если буфер полон - держит товар и стоит заблокированным, пока место не
+    освободится (блокировка после обслуживания). Конвейер без товара в буфере
+    простаивает (голодает). При mtbf > 0 конвейер отказывает после
+    экспоненциальной наработки и чинится mttr в среднем; ремонт продлевает
+    текущую операцию (прерывание с дообработкой), поэтому отказы не требуют
+    отдельных событий.
+
+    Очередь событий - куча окончаний операций (время, номер, конвейер).
+
+    Returns:
+        Словарь: throughput - выпуск в единицу времени после warmup,
+        cycle_time - среднее время от начала первой операции до выхода
+        (для товаров, вышедших после warmup), доли времени каждого конвейера
+        busy/down/blocked/starved за смену и число обработанных событий.
+    """
+    rng = np.random.default_rng(seed)
+    stations = len(times)
+    last = stations - 1
+    randoms = [StationRandom(rng, float(mean), cv, mtbf, mttr) for mean in times]
+    uptime = [randoms[j].time_to_failure() if mtbf > 0 else math.inf for j in range(stations)]
+
+    buffers = [deque() for _ in range(stations)]
+    busy = [False] * stations
+    held = [None] * stations  # товар, который заблокированный конвейер не может отдать
+    blocked_since = [0.0] * stations
+    busy_time = [0.0] * stations
+    down_time = [0.0] * stations
+    blocked_time = [0.0] * stations
+    processing = [None] * stations
+    # Текущая операция: начало и отрезки по порядку (ремонт?, длительность)
+    operation_start = [0.0] * stations
+    operation_parts = [None] * stations
+
+    events = []
+    sequence = 0
+    count = 0
+    finished = 0
+    cycle_total = 0.0
+
+    def start(j, item, now):
+        """Начинает операцию над товаром item (время входа на линию) на конвейере j."""
+        nonlocal sequence
+        work = randoms[j].processing_time()
+        busy_time[j] += work
+        duration = work
+        parts = [(False, work)]
+        if work > uptime[j]:
+            # Отказ посреди операции: работа до отказа, ремонт, дообработка (возможно, с новыми отказами)
+            parts = []
+            while work > uptime[j]:
+                repair = randoms[j].repair_time()
+                parts.append((False, uptime[j]))
+                parts.append((True, repair))
+                work -= uptime[j]
+                duration += repair
+                down_time[j] += repair
+                uptime[j] = randoms[j].time_to_failure()
+            parts.append((False, work))
+        uptime[j] -= work
+        operation_start[j] = now
+        operation_parts[j] = parts
+        busy[j] = True
+        processing[j] = item
+        sequence += 1
+        heapq.heappush(events, (now + duration, sequence, j))
+
+    def pull(j, now):
+        """Свободный конвейер j берет следующий товар; освобождение каскадом будит верхние конвейеры."""
+        while j >= 0 and not busy[j] and held[j] is None:
+            if j == 0:
+                start(0, now, now)
+                return
+            upstream = j - 1
+            if buffers[j]:
+                start(j, buffers[j].popleft(), now)
+                if held[upstream] is None:
+                    return
+                buffers[j].append(held[upstream])
+            elif held[upstream] is not None:
+                start(j, held[upstream], now)
+            else:
+                return
+            # Верхний конвейер отдал удержанный товар и теперь свободен
+            held[upstream] = None
+            blocked_time[upstream] += now - blocked_since[upstream]
+            j = upstream
+
+    pull(0, 0.0)
+    while events:
+        now, _, j = heapq.heappop(events)
+        if now > shift:
+            heapq.heappush(events, (now, 0, j))
+            break
+        count += 1
+        item = processing[j]
+        busy[j] = False
+
+        if j == last:
+            if now >= warmup:
+                finished += 1
+                cycle_total += now - item
+        else:
+            following = j + 1
+            if not busy[following] and held[following] is None and not buffers[following]:
+                start(following, item, now)
+            elif len(buffers[following]) < buffer_size:
+                buffers[following].append(item)
+            else:
+                held[j] = item
+                blocked_since[j] = now
+                continue
+        pull(j, now)
+
+    for j in range(stations):
+        if held[j] is not None:
+            blocked_time[j] += shift - blocked_since[j]
+
+    # Операции, идущие в конце смены, были учтены целиком - часть каждого отрезка
+    # (работы или ремонта) после смены вычитается из своего счетчика
+    for _, _, j in events:
+        begin = operation_start[j]
+        for is_repair, length in operation_parts[j]:
+            overrun = min(length, max(0.0, begin + length - shift))
+            if is_repair:
+                down_time[j] -= overrun
+            else:
+                busy_time[j] -= overrun
+            begin += length
+    busy_share = np.array(busy_time) / shift
+    down_share = np.array(down_time) / shift
+    blocked_share = np.array(blocked_time) / shift
+    return {
+        "throughput": finished / (shift - warmup),
+        "cycle_time": cycle_total / finished if finished else math.nan,
+        "busy": busy_share,
+        "down": down_share,
+        "blocked": blocked_share,
+        "starved": np.maximum(0.0, 1 - busy_share - down_share - blocked_share),
+        "events": count,
+    }
+
+
+def incomplete_beta(a, b, x):
+    """Регуляризованная неполная бета-функция I_x(a, b) (цепная дробь, метод Ленца)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - incomplete_beta(b, a, 1 - x)
+
+    log_prefix = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (tiny if abs(d) < tiny else d)
+    h = d
+    for m in range(1, 1000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (tiny if abs(d) < tiny else d)
+            c = 1 + numerator / c
+            c = tiny if abs(c) < tiny else c
+            h *= d * c
+        if abs(d * c - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h / a
+
+
+def student_t_quantile(p, df):
+    """Квантиль распределения Стьюдента уровня p (p > 0.5) бисекцией по функции распределения."""
+    lo, hi = 0.0, 1.0
+    while 1 - 0.5 * incomplete_beta(df / 2, 0.5, df / (df + hi * hi)) < p:
+        hi *= 2
+    for _ in range(100):
+        middle = (lo + hi) / 2
+        if 1 - 0.5 * incomplete_beta(df / 2, 0.5, df / (df + middle * middle)) < p:
+            lo = middle
+        else:
+            hi = middle
+    return (lo + hi) / 2
+
+
+def confidence_interval(values, confidence=0.95):
+    """Среднее и полуширина доверительного интервала по независимым репликациям (t-распределение)."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return (float(values.mean()) if len(values) else math.nan), math.inf
+    half_width = student_t_quantile(0.5 + confidence / 2, len(values) - 1) * values.std(ddof=1) / math.sqrt(len(values))
+    return float(values.mean()), float(half_width)
+
+
+def run(times, replications, buffer_size, shift, warmup, seed=0, workers=None, **options):
+    """
+    Независимые репликации simulate в пуле процессов.
+
+    Сиды репликаций порождаются из seed через SeedSequence.spawn, поэтому результат
+    не зависит от числа процессов.
+
+    Returns:
+        Список результатов simulate по порядку репликаций.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(simulate, times, buffer_size, shift, warmup, child, **options) for child in seeds]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Дискретно-событийная модель конвейерной линии: случайные времена, буферы, отказы.')
+    parser.add_argument('input_file', type=str, help="Конфигурация линии (';'); среднее время операции - t / c.")
+    parser.add_argument('--shift', type=float, default=480.0, help='Длина смены (в единицах t).')
+    parser.add_argument('--warmup', type=float, default=0.0, help='Разгон линии, не входящий в статистику выпуска.')
+    parser.add_argument('--buffer', type=int, default=5, help='Вместимость буфера между соседними конвейерами.')
+    parser.add_argument('--cv', type=float, default=0.5, help='Коэффициент вариации времени операции (0 - детерминированное).')
+    parser.add_argument('--mtbf', type=float, default=0.0, help='Средняя наработка на отказ (0 - без отказов).')
+    parser.add_argument('--mttr', type=float, default=0.0, help='Среднее время ремонта.')
+    parser.add_argument('--replications', type=int, default=30, help='Число независимых репликаций.')
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - все ядра).')
+    parser.add_argument('--seed', type=int, default=0, help='Начальный сид.')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Уровень доверия интервалов.')
+    args = parser.parse_args()
+
+    try:
+        if args.warmup >= args.shift:
+            raise ValueError("Разгон должен быть короче смены.")
+        _, conveyors = read_config(args.input_file)
+        ms, times = stage_times(conveyors)
+
+        start_time = time.perf_counter()
+        results = run(times, args.replications, args.buffer, args.shift, args.warmup, args.seed, args.workers,
+                      cv=args.cv, mtbf=args.mtbf, mttr=args.mttr)
+        elapsed = time.perf_counter() - start_time
+    except FileNotFoundError:
+        print(f"Ошибка: файл {args.input_file} не найден.", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    level = f"{args.confidence:.0%}"
+    mean, half = confidence_interval([r["throughput"] for r in results], args.confidence)
+    print(f"Выпуск: {mean:.4f} ± {half:.4f} товаров в единицу времени ({level})")
+    mean, half = confidence_interval([r["cycle_time"] for r in results], args.confidence)
+    print(f"Время цикла: {mean:.2f} ± {half:.2f} ({level})")
+    for j, m in enumerate(ms.tolist()):
+        shares = {key: np.mean([r[key][j] for r in results]) for key in ("busy", "down", "blocked", "starved")}
+        print(f"Конвейер {m}: работа {shares['busy']:.1%}, ремонт {shares['down']:.1%}, "
+              f"блокировка {shares['blocked']:.1%}, голод {shares['starved']:.1%}")
+
+    events = sum(r["events"] for r in results)
+    print(f"{args.replications} репликаций, {events} событий за {elapsed:.1f} с ({events / elapsed:.0f} событий/с)",
+          file=sys.stderr)
@@ -0,0 +1,182 @@
+import argparse
+import heapq
+import sys
+
+import numpy as np
+
+from conveyor_schedule import read_config, summary_times
+
+# Относительная точность бисекции по узкому месту
+BOTTLENECK_TOLERANCE = 1e-12
+
+
+def workers_needed(t, bottleneck):
+    """Минимальное число рабочих на каждом этапе, чтобы t / c не превышало bottleneck (не меньше одного)."""
+    # Небольшой запас, чтобы t / (t / k) = k.0000001 не превращалось в k + 1
+    return np.maximum(1, np.ceil(t / bottleneck * (1 - BOTTLENECK_TOLERANCE))).astype(np.int64)
+
+
+def min_bottleneck(t, budget):
+    """
+    Наименьшее достижимое узкое место max(t / c) при sum(c) <= budget - бисекцией.
+
+    Число нужных рабочих workers_needed не возрастает с ростом узкого места,
+    поэтому граница ищется двоичным поиском, а затем "прилипает" к
+    достигнутому значению max(t / c). Каждая проверка - O(stages) в NumPy,
+    от бюджета время не зависит.
+
+    Returns:
+        (bottleneck, c): узкое место и минимальное распределение, которое его дает.
+    """
+    lo, hi = 0.0, float(t.max())
+    if hi == 0:
+        c = np.ones(len(t), dtype=np.int64)
+        return 0.0, c
+    while hi - lo > hi * BOTTLENECK_TOLERANCE:
+        middle = (lo + hi) / 2
+        if workers_needed(t, middle).sum() <= budget:
+            hi = middle
+        else:
+            lo = middle
+    c = workers_needed(t, hi)
+    return float(np.max(t / c)), c
+
+
+def t_opt(t, c, goods):
+    """T_опт = sum(t / c) + (n - 1) * max(t / c)."""
+    times = t / c
+    return float(times.sum() + (goods - 1) * times.max())
+
+
+def spread_remaining(t, c, budget):
+    """
+    Раздает рабочих сверх c (до budget) так, чтобы sum(t / c) была наименьшей.
+
+    Рабочий, который k-м приходит на этап, уменьшает t / c на t / (k * (k - 1));
+    эти выигрыши убывают, поэтому оптимум - взять все выигрыши не меньше некоторого
+    порога. На этапе их floor((1 + sqrt(1 + 4 t / порог)) / 2), порог ищется
+    бисекцией за O(stages) на шаг, а последние рабочие, которых не хватило до
+    точного порога, раздаются кучей по наибольшему выигрышу. Узкое место не растет.
+    """
+    active = t > 0
+    if budget <= c.sum() or not active.any():
+        return c.copy()
+
+    def counts(gain):
+        k = np.floor((1 + np.sqrt(1 + 4 * t / gain)) / 2)
+        return np.where(active, np.maximum(c, k), c).astype(np.int64)
+
+    # Порог выше любого следующего выигрыша не добавляет ни одного рабочего
+    lo, hi = 0.0, 2 * float(np.max(t / (c * (c + 1))))
+    while hi - lo > hi * BOTTLENECK_TOLERANCE:
+        middle = (lo + hi) / 2
+        if counts(middle).sum() <= budget:
+            hi = middle
+        else:
+            lo = middle
+    c = counts(hi)
+
+    heap = [(-(t[j] / c[j] - t[j] / (c[j] + 1)), j) for j in np.flatnonzero(active).tolist()]
+    heapq.heapify(heap)
+    for _ in range(budget - int(c.sum())):
+        _, j = heapq.heappop(heap)
+        c[j] += 1
+        heapq.heappush(heap, (-(t[j] / c[j] - t[j] / (c[j] + 1)), j))
+    return c
+
+
+def allocate_workers(t, budget, goods):
+    """
+    Распределение budget рабочих по этапам с базовыми временами t, минимизирующее
+    T_опт = sum(t / c) + (n - 1) * max(t / c) для n = goods.
+
+    Бисекцией находится наименьшее узкое место (главный член T_опт) и минимальное
+    число рабочих на каждом этапе для него, остаток раздается spread_remaining.
+    При малом n сумма может перевесить узкое место, поэтому затем узкое место
+    поднимается по уровням: на каждом один этап обходится на одного рабочего
+    меньше. Если эта нижняя граница была достигнута, освободившийся рабочий
+    переходит к этапу с наибольшим выигрышем (для выпуклых t / c оптимум с
+    ослабленной границей отличается ровно на такой перенос) - O(log stages) на
+    уровень через кучи. Подъем прекращается, когда (n - 1) * уровень плюс
+    наименьшая возможная сумма не меньше лучшего T_опт; при большом n и при
+    n = 1 это происходит сразу.
+
+    Raises:
+        ValueError: рабочих меньше, чем этапов (каждому этапу нужен хотя бы один).
+    """
+    t = np.asarray(t, dtype=float)
+    if budget < len(t):
+        raise ValueError(f"Рабочих ({budget}) меньше, чем конвейеров ({len(t)}).")
+
+    # Распределение с наименьшей суммой без оглядки на узкое место - начальная оценка,
+    # а его сумма - нижняя граница суммы при любом узком месте
+    best = spread_remaining(t, np.ones(len(t), dtype=np.int64), budget)
+    best_value = t_opt(t, best, goods)
+    lower_sum = float(np.sum(t / best))
+
+    _, lower = min_bottleneck(t, budget)
+    c = spread_remaining(t, lower, budget)
+    if t_opt(t, c, goods) < best_value:
+        best, best_value = c.copy(), t_opt(t, c, goods)
+
+    # Кучи с ленивым удалением: запись верна, пока c (или lower) этапа не изменилось
+    gains = [(-t[j] / (c[j] * (c[j] + 1)), j, c[j]) for j in range(len(t)) if t[j] > 0]
+    peaks = [(-t[j] / c[j], j, c[j]) for j in range(len(t))]
+    levels = [(t[j] / (lower[j] - 1), j) for j in range(len(t)) if lower[j] > 1]
+    for heap in (gains, peaks, levels):
+        heapq.heapify(heap)
+    total = float(np.sum(t / c))
+
+    def change(j, delta):
+        nonlocal total
+        total += t[j] / (c[j] + delta) - t[j] / c[j]
+        c[j] += delta
+        heapq.heappush(peaks, (-t[j] / c[j], j, c[j]))
+        if t[j] > 0:
+            heapq.heappush(gains, (-t[j] / (c[j] * (c[j] + 1)), j, c[j]))
+
+    while levels:
+        level, j = heapq.heappop(levels)
+        if (goods - 1) * level + lower_sum >= best_value * (1 - BOTTLENECK_TOLERANCE):
+            break
+        lower[j] -= 1
+        if lower[j] > 1:
+            heapq.heappush(levels, (t[j] / (lower[j] - 1), j))
+        if c[j] != lower[j] + 1:
+            continue
+
+        change(j, -1)
+        while gains[0][2] != c[gains[0][1]]:
+            heapq.heappop(gains)
+        change(gains[0][1], 1)
+
+        while peaks[0][2] != c[peaks[0][1]]:
+            heapq.heappop(peaks)
+        value = total - (goods - 1) * peaks[0][0]
+        if value < best_value:
+            best, best_value = c.copy(), value
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Подбор числа рабочих на конвейерах, минимизирующий T_опт.')
+    parser.add_argument('input_file', type=str, help="Конфигурация линии (';'); колонки c в ней - исходное распределение.")
+    parser.add_argument('--workers', type=int, required=True, help='Общее число рабочих.')
+    args = parser.parse_args()
+
+    try:
+        goods, conveyors = read_config(args.input_file)
+        conveyors.sort(key=lambda x: x['m'])
+        c = allocate_workers([conveyor['t'] for conveyor in conveyors], args.workers, goods)
+
+        _, _, t_opt_before = summary_times(goods, conveyors)
+        optimized = [dict(conveyor, c=int(count)) for conveyor, count in zip(conveyors, c)]
+        _, _, t_opt_after = summary_times(goods, optimized)
+
+        for conveyor, count in zip(conveyors, c.tolist()):
+            print(f"Конвейер {conveyor['m']}: t = {conveyor['t']}, c = {conveyor['c']} -> {count}")
+        print(f"T_опт: {t_opt_before:.2f} -> {t_opt_after:.2f} ({args.workers} рабочих)")
+    except FileNotFoundError:
+        print(f"Ошибка: файл {args.input_file} не найден.", file=sys.stderr)
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+import pygame
+
+SOUND_DIR = "sound"
+CLIP_COUNT = 29
+
+POOL_CHANNELS = 16       # каналы микшера под удары кубиков
+VOICES_PER_DIE = 2       # одновременных звуков от одного кубика
+RETRIGGER_INTERVAL = 0.05  # не чаще одного удара кубика за столько секунд
+
+# Импульс удара (масса * скорость после отскока), которому соответствуют тишина и полная громкость
+QUIET_IMPULSE = 0.5
+LOUD_IMPULSE = 6.0
+MIN_VOLUME = 0.05
+
+
+class CollisionSound:
+    """
+    Звуки ударов кубиков из заранее декодированных клипов и пула каналов.
+
+    Все клипы sound/dub-*.mp3 декодируются один раз фоновым потоком при запуске,
+    поэтому удар никогда не ждет диска и декодера: пока клип не загружен,
+    он просто пропускается. Под удары резервируются POOL_CHANNELS каналов микшера.
+    Один кубик звучит не более чем VOICES_PER_DIE голосами (новый удар вытесняет
+    его самый старый звук), громкость растет с силой удара. Когда заняты все
+    каналы, вытесняется самый старый звук не громче нового, иначе удар тише
+    всех звучащих отбрасывается.
+    """
+
+    def __init__(self, sound_dir=SOUND_DIR, clip_count=CLIP_COUNT, channels=POOL_CHANNELS,
+                 voices_per_die=VOICES_PER_DIE, telemetry=None):
+        self.paths = [os.path.join(sound_dir, f"dub-{i}.mp3") for i in range(clip_count)]
+        self.clips = [None] * clip_count
+        self.next_clip = 0
+        self.voices_per_die = voices_per_die
+        self.telemetry = telemetry
+
+        if pygame.mixer.get_num_channels() < channels:
+            pygame.mixer.set_num_channels(channels)
+        # Зарезервированные каналы Sound.play() не занимает - ими распоряжается только пул
+        pygame.mixer.set_reserved(channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        # Для каждого канала: кубик, время начала и громкость текущего звука
+        self.owner = [-1] * channels
+        self.started = [0.0] * channels
+        self.volume = [0.0] * channels
+        self.last_hit = {}
+
+        self.thread = threading.Thread(target=self.load, daemon=True)
+        self.thread.start()
+
+    def load(self):
+        for i, path in enumerate(self.paths):
+            try:
+                self.clips[i] = pygame.mixer.Sound(path)
+            except (pygame.error, FileNotFoundError) as e:
+                if self.telemetry is not None:
+                    self.telemetry.log(f"Error loading sound {path}: {e}")
+
+    def clip(self):
+        """Следующий загруженный клип по кругу или None, если пока ни одного нет."""
+        for _ in range(len(self.clips)):
+            clip = self.clips[self.next_clip]
+            self.next_clip = (self.next_clip + 1) % len(self.clips)
+            if clip is not None:
+                return clip
+        return None
+
+    def channel_for(self, die, volume):
+        """Индекс канала для нового звука кубика die или None, если звук нужно отбросить."""
+        busy = [channel.get_busy() for channel in self.channels]
+        own = [i for i, owner in enumerate(self.owner) if owner == die and busy[i]]
+        if len(own) >= self.voices_per_die:
+            return min(own, key=lambda i: self.started[i])
+
+        for i, is_busy in enumerate(busy):
+            if not is_busy:
+                return i
+
+        quieter = [i for i in range(len(self.channels)) if self.volume[i] <= volume]
+        if quieter:
+            return min(quieter, key=lambda i: self.started[i])
+        return None
+
+    def play_sound(self, die, impulse):
+        """Звук удара кубика die с импульсом impulse; не блокирует вызывающий поток."""
+        now = time.perf_counter()
+        if now - self.last_hit.get(die, -RETRIGGER_INTERVAL) < RETRIGGER_INTERVAL:
+            return
+        clip = self.clip()
+        if clip is None:
+            return
+
+        volume = (impulse - QUIET_IMPULSE) / (LOUD_IMPULSE - QUIET_IMPULSE)
+        volume = min(1.0, max(MIN_VOLUME, volume))
+        i = self.channel_for(die, volume)
+        if i is None:
+            return
+
+        self.last_hit[die] = now
+        self.owner[i] = die
+        self.started[i] = now
+        self.volume[i] = volume
+        channel = self.channels[i]
+        channel.play(clip)
+        channel.set_volume(volume)
+
+    def reset(self):
+        """Забывает кубики прежней горсти (индексы кубиков новой горсти начинаются заново)."""
+        self.owner = [-1] * len(self.channels)
+        self.last_hit = {}
@@ -1,12 +1,25 @@
+import argparse
+import ctypes
+import hashlib
 import random
 import math
+import numpy as np
 import pygame
 import os
+import sys
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
+# Общие для визуализаторов модули лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from glyph_atlas import GlyphAtlas, TextBatch
+from dice_physics import DiceBodies, dice_geometry, quaternion_matrices
+from dice_replay import DiceSimulation, Recorder, Replay, PHYSICS_DT, SNAPSHOT_INTERVAL
+from telemetry import TelemetrySink, record_step, LEVEL_NAMES, RESULTS
+from dice_audio import CollisionSound
+
 # --- Константы ---
 WINDOW_WIDTH = 1920
 WINDOW_HEIGHT = 1080
@@ -15,9 +28,12 @@ DICE_TYPES = {
     6: "Cube"
 }
 DEFAULT_DICE_TYPE = 6
-RESTITUTION = 0.6
-FRICTION = 0.8
-STABLE_THRESHOLD = 0.98
+# Долгий кадр (перетаскивание окна, отладчик) не догоняется больше чем на столько секунд
+MAX_FRAME_TIME = 0.25
+# Горсть кубиков: количество меняется клавишами +/-
+DEFAULT_DICE_COUNT = 1
+# Больше кубиков физика с шагом 1/300 с и отрисовка вместе не успевают в реальном времени
+MAX_DICE_COUNT = 30
 
 # --- Цвета ---
 WHITE = (1, 1, 1)
@@ -34,120 +50,97 @@ MOVE_SPEED = 0.2
 
 # --- Skybox ---
 SKYBOX_RADIUS = 50  # Радиус скайбокса
+TEXTURE_CACHE_DIR = ".texture_cache"  # Декодированные текстуры, ключ - хэш файла
 
 
 # --- Классы ---
 
 class Dice:
-    def __init__(self, num_sides, size=1.0):
+    """
+    Кубик - представление одной строки в DiceBodies.
+
+    Физическое состояние хранится в массивах bodies, поэтому много кубиков
+    в одном хранилище обновляются одним пакетным шагом.
+    """
+
+    def __init__(self, num_sides, size=1.0, bodies=None, index=None):
+        """index - уже добавленная в bodies строка; если не задан, кубик добавляется."""
         self.num_sides = num_sides
         self.size = size
-        self.vertices = []
-        self.faces = []
-        self.normals = []
-        self.colors = []
-        self.rotation = [0, 0, 0]
-        self.position = [0, 0, 0]
-        self.velocity = [0, 0, 0]
-        self.angular_velocity = [0, 0, 0]
-        self.is_rolling = False
-        self.result = 0
-        self.create_geometry()
-        self.number_vertices = {}
-        self.generate_number_vertices()
-        self.is_sleeping = False
-        self.grounded_timer = 0
+        self.vertices, self.faces, self.normals, self.colors = dice_geometry(num_sides, size)
+        self.bodies = bodies if bodies is not None else DiceBodies(capacity=1)
+        self.index = self.bodies.add(num_sides, size) if index is None else index
         self.collision_hook = None
+        self.telemetry = None
 
-        if self.num_sides == 4:
-            self.mass = 0.8
-        elif self.num_sides == 6:
-            self.mass = 1.0
-        else:
-            self.mass = 1.0
-
+        self.mass = self.bodies.mass[self.index]
         self.inertia_tensor = self.calculate_inertia_tensor()
         self.inv_inertia_tensor = self.calculate_inverse_inertia_tensor()
 
+    # --- Состояние в хранилище ---
+
+    @property
+    def position(self):
+        return self.bodies.position[self.index]
+
+    @position.setter
+    def position(self, value):
+        self.bodies.position[self.index] = value
+
+    @property
+    def velocity(self):
+        return self.bodies.velocity[self.index]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.bodies.velocity[self.index] = value
+
+    @property
+    def orientation(self):
+        return self.bodies.orientation[self.index]
+
+    @orientation.setter
+    def orientation(self, value):
+        self.bodies.set_orientation(self.index, value)
+
+    @property
+    def rotation_matrix(self):
+        return self.bodies.matrices[self.index]
+
+    @property
+    def angular_velocity(self):
+        return self.bodies.angular_velocity[self.index]
+
+    @angular_velocity.setter
+    def angular_velocity(self, value):
+        self.bodies.angular_velocity[self.index] = value
+
+    @property
+    def is_rolling(self):
+        return bool(self.bodies.is_rolling[self.index])
+
+    @property
+    def is_sleeping(self):
+        return bool(self.bodies.is_sleeping[self.index])
+
+    @property
+    def result(self):
+        return int(self.bodies.result[self.index])
+
     def calculate_inertia_tensor(self):
-        if self.num_sides == 6:
-            i = (1 / 6) * self.mass * self.size ** 2
-            return [[i, 0, 0], [0, i, 0], [0, 0, i]]
-        elif self.num_sides == 4:
-            i = (1 / 20) * self.mass * self.size ** 2 * 5
-            return [[i, 0, 0], [0, i, 0], [0, 0, i]]
-        return [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+        i = self.bodies.inertia[self.index]
+        return [[i[0], 0, 0], [0, i[1], 0], [0, 0, i[2]]]
 
     def calculate_inverse_inertia_tensor(self):
-        tensor = self.calculate_inertia_tensor()
-        inv_tensor = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
-        for i in range(3):
-            if tensor[i][i] != 0:
-                inv_tensor[i][i] = 1.0 / tensor[i][i]
-        return inv_tensor
-
-    def create_geometry(self):
-        if self.num_sides == 4:
-            s = self.size
-            self.vertices = [
-                (s, s, s), (s, -s, -s), (-s, s, -s), (-s, -s, s)
-            ]
-            self.faces = [
-                (0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)
-            ]
-            self.normals = [
-                self.calculate_normal(self.vertices[f[0]], self.vertices[f[1]], self.vertices[f[2]])
-                for f in self.faces
-            ]
-            self.colors = [RED, GREEN, BLUE, WHITE]
-
-        elif self.num_sides == 6:
-            s = self.size / 2
-            self.vertices = [
-                (s, s, -s), (s, -s, -s), (-s, -s, -s), (-s, s, -s),
-                (s, s, s), (s, -s, s), (-s, -s, s), (-s, s, s)
-            ]
-            self.faces = [
-                (0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4),
-                (2, 3, 7, 6), (0, 3, 7, 4), (1, 2, 6, 5)
-            ]
-            self.normals = [
-                self.calculate_normal(self.vertices[f[0]], self.vertices[f[1]], self.vertices[f[2]])
-                for f in self.faces
-            ]
-            self.colors = [
-                RED, GREEN, BLUE, WHITE,
-                (1, 0.5, 0), (0, 0.5, 1), (0.5, 0, 1), (1, 1, 0)
-            ]
-
-    def calculate_normal(self, v1, v2, v3):
-        edge1 = (v2[0] - v1[0], v2[1] - v1[1], v2[2] - v1[2])
-        edge2 = (v3[0] - v1[0], v3[1] - v1[1], v3[2] - v1[2])
-        normal = (
-            edge1[1] * edge2[2] - edge1[2] * edge2[1],
-            edge1[2] * edge2[0] - edge1[0] * edge2[2],
-            edge1[0] * edge2[1] - edge1[1] * edge2[0]
-        )
-        length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
-        if length == 0: return (0, 0, 0)
-        return (normal[0] / length, normal[1] / length, normal[2] / length)
-
-    def generate_number_vertices(self):
-        self.number_vertices = {
-            '1': [(0, -1), (0, 1)],
-            '2': [(-0.5, 1), (0.5, 1), (0.5, 0), (-0.5, 0), (-0.5, -1), (0.5, -1)],
-            '3': [(-0.5, 1), (0.5, 1), (0.5, 0), (-0.5, 0), (0.5, 0), (0.5, -1), (-0.5, -1)],
-            '4': [(-0.5, 1), (-0.5, 0), (0.5, 0), (0.5, 1), (0.5, -1)],
-            '5': [(0.5, 1), (-0.5, 1), (-0.5, 0), (0.5, 0), (0.5, -1), (-0.5, -1)],
-            '6': [(0.5, 1), (-0.5, 1), (-0.5, -1), (0.5, -1), (0.5, 0), (-0.5, 0)]
-        }
+        i = self.bodies.inv_inertia[self.index]
+        return [[i[0], 0, 0], [0, i[1], 0], [0, 0, i[2]]]
 
-    def draw(self):
+    def draw(self, position=None, rotation_matrix=None):
+        """Рисует кубик; position и rotation_matrix задают интерполированную позу между шагами физики."""
+        position = self.position if position is None else position
         glPushMatrix()
-        glTranslatef(self.position[0], self.position[1], self.position[2])
-        glRotatef(self.rotation[0], 1, 0, 0)
-        glRotatef(self.rotation[1], 0, 1, 0)
-        glRotatef(self.rotation[2], 0, 0, 1)
+        glTranslatef(position[0], position[1], position[2])
+        glMultMatrixf(self.model_matrix(rotation_matrix))
 
         for i, face in enumerate(self.faces):
             glBegin(GL_POLYGON)
@@ -157,14 +150,10 @@ class Dice:
                 glVertex3fv(self.vertices[vertex_index])
             glEnd()
 
-        if self.is_rolling == False and not self.is_sleeping:
-            self.draw_numbers()
-
         glPopMatrix()
 
-    def draw_numbers(self):
-        glColor3fv(BLACK)
-
+    def add_labels(self, text_batch):
+        """Добавляет номера граней в общий буфер подписей (в мировых координатах)."""
         for i, face in enumerate(self.faces):
             centroid = [0, 0, 0]
             for vertex_index in face:
@@ -178,193 +167,59 @@ class Dice:
             else:
                 offset = [n * 0.3 * self.size for n in self.normals[i % len(self.normals)]]
             text_pos = [centroid[j] + offset[j] for j in range(3)]
+            rotated_pos = self.rotate_point(text_pos)
+            world_pos = [self.position[j] + rotated_pos[j] for j in range(3)]
 
-            glPushMatrix()
-            glTranslatef(text_pos[0], text_pos[1], text_pos[2])
-            glRotatef(-self.rotation[2], 0, 0, 1)
-            glRotatef(-self.rotation[1], 0, 1, 0)
-            glRotatef(-self.rotation[0], 1, 0, 0)
             scale_factor = 0.1 * self.size
             if self.num_sides == 6: scale_factor = 0.2 * self.size
-            glScalef(scale_factor, scale_factor, scale_factor)
-            self.draw_number_lines(str(i + 1))
-            glPopMatrix()
-
-    def draw_number_lines(self, number_str):
-        if number_str in self.number_vertices:
-            glBegin(GL_LINES)
-            for vertex in self.number_vertices[number_str]:
-                glVertex3f(vertex[0], vertex[1], 0)
-            glEnd()
+            text_batch.add(world_pos, str(i + 1), 2 * scale_factor)
 
     def start_roll(self, initial_velocity, initial_angular_velocity):
-        self.velocity = initial_velocity
-        self.angular_velocity = initial_angular_velocity
-        self.is_rolling = True
-        self.result = 0
-        self.is_sleeping = False
-        self.grounded_timer = 0
+        self.bodies.start_roll(self.index, initial_velocity, initial_angular_velocity)
 
     def update(self, dt, plane_y=-2):
-        if self.is_sleeping:
+        """Шаг одного кубика без столкновений с другими (для горсти используется DiceWorld.step)."""
+        events = self.bodies.step(dt, plane_y, indices=[self.index])
+        if len(events.indices) == 0:
             return
+        self.handle_step(events.bounce[0])
+        if self.telemetry is not None:
+            record_step(self.telemetry, self.bodies, events)
 
-        if not self.is_rolling:
-            return
+    def handle_step(self, bounce):
+        """Звук удара по событиям шага; энергия и результат идут в телеметрию."""
+        if bounce and self.collision_hook:
+            self.collision_hook(self.index, self.impulse())
 
-        # --- Гравитация ---
-        self.velocity[1] += -9.81 * dt
-
-        # --- Обновление позиции ---
-        for i in range(3):
-            self.position[i] += self.velocity[i] * dt
-
-        # --- Обновление вращения ---
-        for i in range(3):
-            self.rotation[i] += self.angular_velocity[i] * dt
-        self.rotation = [r % 360 for r in self.rotation]
-
-        # --- Столкновение с полом ---
-        closest_vertex = None
-        min_distance = float('inf')
-
-        for vertex in self.vertices:
-            rotated_vertex = self.rotate_point(vertex, self.rotation)
-            world_vertex = [self.position[i] + rotated_vertex[i] for i in range(3)]
-            distance = world_vertex[1] - plane_y
-            if distance < min_distance:
-                min_distance = distance
-                closest_vertex = world_vertex
-                local_vertex = rotated_vertex
-
-        if min_distance < 0.01:
-            normal = [0, 1, 0]
-            relative_velocity = [self.velocity[i] + (
-                    self.angular_velocity[(i + 1) % 3] * local_vertex[(i + 2) % 3] -
-                    self.angular_velocity[(i + 2) % 3] * local_vertex[(i + 1) % 3]) for i in range(3)]
-            dot_product = sum(relative_velocity[i] * normal[i] for i in range(3))
-
-            if dot_product < 0:
-                impulse = -(1 + RESTITUTION) * dot_product
-                impulse /= (1.0 / self.mass)
-                MAX_IMPULSE = 10.0
-                impulse = min(impulse, MAX_IMPULSE)
-
-                # --- Линейная скорость ---
-                for i in range(3):
-                    self.velocity[i] += (impulse / self.mass) * normal[i]
-
-                # --- Трение ---
-                tangent_velocity = [relative_velocity[i] - dot_product * normal[i] for i in range(3)]
-                tangent_magnitude = math.sqrt(sum(v ** 2 for v in tangent_velocity))
-
-                if tangent_magnitude > 1e-6:
-                    tangent_direction = [v / tangent_magnitude for v in tangent_velocity]
-                    friction_impulse = min(impulse * FRICTION, tangent_magnitude)
-                    cross_product = [
-                        local_vertex[1] * normal[2] - local_vertex[2] * normal[1],
-                        local_vertex[2] * normal[0] - local_vertex[0] * normal[2],
-                        local_vertex[0] * normal[1] - local_vertex[1] * normal[0]
-                    ]
-                    angular_impulse = [cross_product[i] * impulse for i in range(3)]
-                    friction_torque = [cross_product[i] * friction_impulse for i in range(3)]
-
-                    for i in range(3):
-                        for j in range(3):
-                            self.angular_velocity[i] += self.inv_inertia_tensor[i][j] * (
-                                    angular_impulse[j] - friction_torque[j])
-                else:
-                    self.angular_velocity = [0, 0, 0]
-
-                penetration_depth = -min_distance
-                self.position[1] += penetration_depth
-
-                if self.collision_hook:
-                    self.collision_hook(True)
-
-                # --- Расчет и вывод энергии ---
-                kinetic_energy_linear = 0.5 * self.mass * sum(v ** 2 for v in self.velocity)
-                kinetic_energy_angular = 0.5 * sum(
-                    self.inertia_tensor[i][i] * self.angular_velocity[i] ** 2 for i in range(3)
-                )
-                total_energy = kinetic_energy_linear + kinetic_energy_angular
-                print(
-                    f"Energy: {total_energy:.4f}, Vel: {[round(v, 3) for v in self.velocity]}, AngVel: {[round(av, 3) for av in self.angular_velocity]}")
-
-            self.grounded_timer += dt
-
-        else:
-            self.grounded_timer = 0
-
-            if self.collision_hook:
-                self.collision_hook(False)
-
-        # --- Проверка остановки ---
-        if self.grounded_timer > 0.1 and self.is_stable() and all(
-                abs(v) < 0.1 for v in self.velocity) and all(abs(av) < 0.5 for av in self.angular_velocity):
-            self.is_rolling = False
-            self.is_sleeping = True
-            self.determine_result()
+    def impulse(self):
+        """Сила удара для громкости звука: импульс кубика сразу после отскока."""
+        return float(self.bodies.mass[self.index] * np.linalg.norm(self.velocity))
 
     def is_stable(self):
-        up_vector = (0, 1, 0)
-        for normal in self.normals:
-            rotated_normal = self.rotate_point(normal, self.rotation)
-            dot_product = sum(rotated_normal[i] * up_vector[i] for i in range(3))
-            if dot_product >= STABLE_THRESHOLD:
-                return True
-        return False
-
-    def rotate_point(self, point, rotation):
-        x, y, z = point
-        rx, ry, rz = [math.radians(r) for r in rotation]
-
-        y1 = y * math.cos(rx) - z * math.sin(rx)
-        z1 = y * math.sin(rx) + z * math.cos(rx)
-        y, z = y1, z1
-
-        x1 = x * math.cos(ry) + z * math.sin(ry)
-        z1 = -x * math.sin(ry) + z * math.cos(ry)
-        x, z = x1, z1
+        return bool(self.bodies.is_stable([self.index])[0])
 
-        x1 = x * math.cos(rz) - y * math.sin(rz)
-        y1 = x * math.sin(rz) + y * math.cos(rz)
-        x, y = x1, y1
+    def rotate_point(self, point):
+        return (self.rotation_matrix @ point).tolist()
 
-        return [x, y, z]
+    def model_matrix(self, rotation_matrix=None):
+        """Матрица 4x4 для glMultMatrixf: поворот из физики, без переноса (он делается glTranslatef)."""
+        rotation_matrix = self.rotation_matrix if rotation_matrix is None else rotation_matrix
+        matrix = np.eye(4, dtype=np.float32)
+        # OpenGL читает матрицу по столбцам, поэтому передается транспонированная
+        matrix[:3, :3] = rotation_matrix.T
+        return matrix
 
     def determine_result(self):
-        if self.num_sides == 4:
-            upward_vector = (0, -1, 0)
-            min_dot = 2  # максимально близкая грань к вектору "вниз"
-            self.result = 1
-
-            for i, normal in enumerate(self.normals):
-                rotated_normal = self.rotate_point(normal, self.rotation)
-                dot_product = rotated_normal[0] * upward_vector[0] + rotated_normal[1] * upward_vector[1] + \
-                              rotated_normal[2] * upward_vector[2]
-                if 1 - dot_product < min_dot:
-                    min_dot = 1 - dot_product
-                    self.result = i + 1
-
-        elif self.num_sides == 6:
-            upward_vector = (0, 1, 0)  # Вектор, указывающий "вверх"
-            max_dot = -2  # Максимально близкая грань к вектору "вверх"
-            self.result = 1
-
-            for i, normal in enumerate(self.normals):
-                rotated_normal = self.rotate_point(normal, self.rotation)
-                dot_product = rotated_normal[0] * upward_vector[0] + rotated_normal[1] * upward_vector[1] + \
-                              rotated_normal[2] * upward_vector[2]
-                if dot_product > max_dot:
-                    max_dot = dot_product
-                    self.result = i + 1
-
-        print(f"Result: {self.result}")
+        self.bodies.determine_result([self.index])
+        if self.telemetry is not None:
+            self.telemetry.log(f"Result: {self.result}")
 
     def set_collision_hook(self, fn):
         self.collision_hook = fn
 
+    def set_telemetry(self, sink):
+        self.telemetry = sink
+
 
 # --- Функции ---
 
@@ -389,67 +244,218 @@ def init():
     glLightfv(GL_LIGHT0, GL_SPOT_EXPONENT, 2.0)
 
 
-def draw_infinite_plane(size=100, grid_size=5):
-    glBegin(GL_QUADS)
-    glColor3fv(GRAY)
-    glNormal3f(0, 1, 0)
-    glVertex3f(-size, -2, -size)
-    glVertex3f(size, -2, -size)
-    glVertex3f(size, -2, size)
-    glVertex3f(-size, -2, size)
-    glEnd()
-
-    glColor3fv(DARK_GRAY)
-    glLineWidth(1.0)
-    glBegin(GL_LINES)
-    for i in range(-size, size + 1, grid_size):
-        glVertex3f(i, -2, -size)
-        glVertex3f(i, -2, size)
-        glVertex3f(-size, -2, i)
-        glVertex3f(size, -2, i)
-    glEnd()
-
-
-def load_texture(filename):
-    """Загружает текстуру из файла и возвращает её ID."""
+class StaticScene:
+    """
+    Слой неподвижной геометрии: пол, сетка, стенки арены.
+
+    Все, что добавлено через add(), группируется по материалу (тип примитива,
+    цвет, толщина линий) и при build() один раз загружается в VBO. Кадр
+    рисует каждый материал одним glDrawArrays, сколько бы линий и граней ни было.
+    """
+
+    STRIDE = 6 * 4
+
+    def __init__(self):
+        self.parts = {}
+        self.batches = []
+
+    def add(self, mode, color, vertices, normal=(0, 1, 0), line_width=1.0):
+        """Добавляет вершины (N, 3) примитива mode (GL_TRIANGLES, GL_LINES) с общей нормалью."""
+        vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+        normals = np.broadcast_to(np.asarray(normal, dtype=np.float32), vertices.shape)
+        self.parts.setdefault((mode, tuple(color), line_width), []).append(np.hstack([vertices, normals]))
+
+    def add_quad(self, color, corners, normal=(0, 1, 0)):
+        """Четырехугольник из 4 углов по порядку, как в GL_QUADS."""
+        corners = np.asarray(corners, dtype=np.float32)
+        self.add(GL_TRIANGLES, color, corners[[0, 1, 2, 0, 2, 3]], normal)
+
+    def add_grid(self, color, size, step, y, line_width=1.0):
+        """Линии сетки в плоскости y от -size до size через step."""
+        ticks = np.arange(-size, size + 1, step, dtype=np.float32)
+        n = len(ticks)
+        lines = np.zeros((n, 4, 3), dtype=np.float32)
+        lines[:, :, 1] = y
+        lines[:, 0, 0] = lines[:, 1, 0] = ticks
+        lines[:, 0, 2], lines[:, 1, 2] = -size, size
+        lines[:, 2, 2] = lines[:, 3, 2] = ticks
+        lines[:, 2, 0], lines[:, 3, 0] = -size, size
+        self.add(GL_LINES, color, lines, line_width=line_width)
+
+    def build(self):
+        """Загружает накопленную геометрию в видеопамять: по буферу на материал."""
+        for (mode, color, line_width), parts in self.parts.items():
+            data = np.ascontiguousarray(np.vstack(parts))
+            buffer = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+            self.batches.append((mode, color, line_width, buffer, len(data)))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.parts = {}
+
+    def draw(self):
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        for mode, color, line_width, buffer, count in self.batches:
+            glColor3fv(color)
+            if mode == GL_LINES:
+                glLineWidth(line_width)
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glVertexPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(0))
+            glNormalPointer(GL_FLOAT, self.STRIDE, ctypes.c_void_p(12))
+            glDrawArrays(mode, 0, count)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def build_ground(size=100, grid_size=5, y=-2):
+    """Пол с сеткой как статический слой сцены; раньше он заново отправлялся через glBegin каждый кадр."""
+    scene = StaticScene()
+    scene.add_quad(GRAY, [(-size, y, -size), (size, y, -size), (size, y, size), (-size, y, size)])
+    scene.add_grid(DARK_GRAY, size, grid_size, y)
+    scene.build()
+    return scene
+
+
+def sphere_mesh(radius, slices=32, stacks=32):
+    """
+    Сфера как у gluSphere (ось z, те же текстурные координаты), но одним массивом.
+
+    Returns:
+        vertex_data: (N, 5) float32 - позиция xyz и текстурные координаты st.
+        indices: uint32 индексы треугольников.
+    """
+    rho = np.linspace(0, np.pi, stacks + 1)[:, np.newaxis]
+    theta = np.linspace(0, 2 * np.pi, slices + 1)[np.newaxis, :]
+    x = np.sin(theta) * np.sin(rho)
+    y = np.cos(theta) * np.sin(rho)
+    z = np.cos(rho) * np.ones_like(theta)
+    s = np.broadcast_to(1 - theta / (2 * np.pi), x.shape)
+    t = np.broadcast_to(1 - rho / np.pi, x.shape)
+    vertex_data = np.stack([x * radius, y * radius, z * radius, s, t], axis=-1).reshape(-1, 5)
+
+    row = slices + 1
+    i, j = np.meshgrid(np.arange(stacks), np.arange(slices), indexing="ij")
+    a = (i * row + j).ravel()
+    b = a + row
+    indices = np.column_stack([a, b, a + 1, a + 1, b, b + 1]).ravel()
+    return vertex_data.astype(np.float32), indices.astype(np.uint32)
+
+
+class SkyboxMesh:
+    """Сфера скайбокса в VBO + индексном буфере: строится один раз, рисуется одним glDrawElements."""
+
+    STRIDE = 5 * 4
+
+    def __init__(self, radius, slices=32, stacks=32):
+        vertex_data, indices = sphere_mesh(radius, slices, stacks)
+        self.index_count = len(indices)
+
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_STATIC_DRAW)
+
+        self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, self.STRIDE, ctypes.c_void_p(12))
+
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+def decode_image(filename):
+    """
+    Пиксели RGBA (снизу вверх, как ждет OpenGL) через кэш на диске.
+
+    Кэш лежит в TEXTURE_CACHE_DIR рядом с картинкой, ключ - SHA-1 содержимого файла,
+    поэтому измененная картинка просто получает новую запись. Повторный запуск
+    читает готовый массив вместо декодирования JPEG.
+    """
+    with open(filename, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(filename)), TEXTURE_CACHE_DIR)
+    cache_path = os.path.join(cache_dir, digest + ".npy")
     try:
-        image = pygame.image.load(filename)
-        texture_data = pygame.image.tostring(image, "RGBA", 1)
-        width, height = image.get_size()
+        return np.load(cache_path)
+    except (OSError, ValueError):
+        pass
 
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, texture_data)
+    image = pygame.image.load(filename)
+    width, height = image.get_size()
+    pixels = np.frombuffer(pygame.image.tostring(image, "RGBA", 1), dtype=np.uint8).reshape(height, width, 4)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы прерванная запись не испортила кэш
+        temporary = cache_path + ".tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, pixels)
+        os.replace(temporary, cache_path)
+    except OSError:
+        pass
+    return pixels
+
+
+def load_texture(filename, compress=False):
+    """
+    Загружает текстуру из файла (через кэш decode_image) с мипмапами и возвращает её ID.
+
+    compress=True просит драйвер хранить текстуру в сжатом формате (меньше видеопамяти).
+
+    Raises:
+        pygame.error, OSError: файл не найден или не декодируется.
+    """
+    pixels = decode_image(filename)
+    height, width = pixels.shape[:2]
+
+    texture_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture_id)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    internal_format = GL_COMPRESSED_RGBA if compress else GL_RGBA
+    if bool(glGenerateMipmap):
+        glTexImage2D(GL_TEXTURE_2D, 0, internal_format, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        glGenerateMipmap(GL_TEXTURE_2D)
+    else:
+        gluBuild2DMipmaps(GL_TEXTURE_2D, internal_format, width, height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glBindTexture(GL_TEXTURE_2D, 0)
 
-        return texture_id
-    except pygame.error as e:
-        print(f"Error loading texture {filename}: {e}")
-        return None
+    return texture_id
 
 
-def draw_skybox(radius, texture_id):
-    """Рисует сферический скайбокс."""
+def draw_skybox(mesh, texture_id):
+    """Рисует сферический скайбокс из готового меша."""
 
     glDisable(GL_LIGHTING)
     glDepthMask(GL_FALSE)
     glBindTexture(GL_TEXTURE_2D, texture_id)
     glEnable(GL_TEXTURE_2D)
 
-    quadric = gluNewQuadric()
-    gluQuadricTexture(quadric, GL_TRUE)
-    gluQuadricNormals(quadric, GLU_SMOOTH)
-    gluSphere(quadric, radius, 32, 32)
-    gluDeleteQuadric(quadric)
+    mesh.draw()
 
     glDisable(GL_TEXTURE_2D)
     glDepthMask(GL_TRUE)
     glEnable(GL_LIGHTING)
 
 
-def display():
+def display(alpha=1.0):
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     glLoadIdentity()
 
@@ -459,14 +465,112 @@ def display():
     glTranslatef(-camera_x, -camera_y, -camera_z)
 
     # --- Скайбокс ---
-    draw_skybox(SKYBOX_RADIUS, skybox_texture)
+    draw_skybox(skybox_mesh, skybox_texture)
 
-    draw_infinite_plane()
-    dice.draw()
+    static_scene.draw()
+    positions, matrices = interpolated_poses(alpha)
+    for die, position, rotation_matrix in zip(dice, positions, matrices):
+        die.draw(position, rotation_matrix)
+    draw_labels()
 
     pygame.display.flip()
 
 
+def draw_labels():
+    """Номера граней кубиков, ожидающих броска; буфер пересобирается только при смене состояния."""
+    global labels_state
+
+    waiting = [die for die in dice if not die.is_rolling and not die.is_sleeping]
+    state = (id(dice_world), tuple((die.index, tuple(die.position), tuple(die.orientation)) for die in waiting))
+    if state != labels_state:
+        text_batch.clear()
+        for die in waiting:
+            die.add_labels(text_batch)
+        labels_state = state
+
+    text_batch.draw(color=BLACK)
+
+
+def interpolated_poses(alpha):
+    """Позы кубиков между двумя последними шагами физики: позиции линейно, повороты - nlerp кватернионов."""
+    bodies = simulation.world.bodies
+    position = bodies.position[:bodies.count]
+    orientation = bodies.orientation[:bodies.count]
+    previous_position, previous_orientation = previous_poses
+    if len(previous_position) != len(position):
+        return position, bodies.matrices[:bodies.count]
+
+    # q и -q - один поворот; берем ближайший
+    sign = np.where(np.sum(previous_orientation * orientation, axis=1) < 0, -1.0, 1.0)[:, np.newaxis]
+    blended = (1 - alpha) * previous_orientation * sign + alpha * orientation
+    blended /= np.linalg.norm(blended, axis=1)[:, np.newaxis]
+    return (1 - alpha) * previous_position + alpha * position, quaternion_matrices(blended)
+
+
+def remember_poses():
+    global previous_poses
+    bodies = simulation.world.bodies
+    previous_poses = (bodies.position[:bodies.count].copy(), bodies.orientation[:bodies.count].copy())
+
+
+def sync_dice():
+    """Пересоздает представления Dice, если у симуляции новый мир (новая горсть, перемотка)."""
+    global dice, dice_world
+    if simulation.world is dice_world:
+        return
+
+    dice_world = simulation.world
+    bodies = dice_world.bodies
+    dice = []
+    collision_sound.reset()
+    for i in range(bodies.count):
+        die = Dice(int(bodies.num_sides[i]), size=float(bodies.size[i]), bodies=bodies, index=i)
+        die.set_collision_hook(collision_sound.play_sound)
+        die.set_telemetry(telemetry)
+        dice.append(die)
+    remember_poses()
+
+
+def send(command):
+    """Вход пользователя в симуляцию; при воспроизведении входы берутся из записи."""
+    if replay is not None:
+        return
+    simulation.apply(command)
+    if recorder is not None:
+        recorder.record_input(simulation, command)
+    sync_dice()
+
+
+def physics_step():
+    """Один шаг фиксированной длины PHYSICS_DT."""
+    global replay_diverged
+    remember_poses()
+    if replay is not None:
+        if simulation.step_index >= replay.length:
+            return
+        events = replay.step(simulation)
+        if not replay_diverged and not replay.matches(simulation):
+            replay_diverged = True
+            telemetry.log(f"Replay diverged at step {simulation.step_index}", simulation.step_index)
+    else:
+        events = simulation.step()
+        if recorder is not None:
+            recorder.after_step(simulation)
+
+    sync_dice()
+    for row, index in enumerate(events.indices):
+        dice[index].handle_step(events.bounce[row])
+    record_step(telemetry, simulation.world.bodies, events, simulation.step_index)
+
+
+def seek(step):
+    """Перемотка записи к шагу step через ближайший снимок."""
+    replay.seek(simulation, max(0, min(step, replay.length)))
+    sync_dice()
+    remember_poses()
+    telemetry.log(f"Replay step {simulation.step_index}/{replay.length}", simulation.step_index)
+
+
 def reshape(width, height):
     glViewport(0, 0, width, height)
     glMatrixMode(GL_PROJECTION)
@@ -475,42 +579,57 @@ def reshape(width, height):
     glMatrixMode(GL_MODELVIEW)
 
 
+def quit_simulation():
+    if recorder is not None:
+        recorder.close()
+    telemetry.close()
+    pygame.quit()
+    sys.exit()
+
+
 def handle_input():
-    global dice, current_dice_type, camera_x, camera_y, camera_z, camera_yaw, camera_pitch, flying_mode
+    global current_dice_type, dice_count, paused, camera_x, camera_y, camera_z, camera_yaw, camera_pitch, flying_mode
 
     for event in pygame.event.get():
         if event.type == QUIT:
-            pygame.quit()
-            sys.exit()
+            quit_simulation()
         elif event.type == KEYDOWN:
             if event.key == K_ESCAPE:
-                pygame.quit()
-                sys.exit()
+                quit_simulation()
             elif event.key == K_SPACE:
-                if not dice.is_rolling:
-                    initial_velocity = [random.uniform(-5, 5), random.uniform(8, 12), random.uniform(-5, 5)]
-                    initial_angular_velocity = [random.uniform(-180, 180), random.uniform(-180, 180),
-                                                random.uniform(-180, 180)]
-                    dice.start_roll(initial_velocity, initial_angular_velocity)
+                send(("roll",))
             elif event.key == K_r:
-                dice = Dice(current_dice_type, size=1.5)
-                dice.position = [0, 3, 0]
-            elif event.key == K_1:
+                send(("handful", current_dice_type, dice_count))
+            elif replay is None and event.key == K_1:
                 current_dice_type = 4
-                dice = Dice(current_dice_type, size=1.5)
-                dice.position = [0, 3, 0]
-                print("Switched to Tetrahedron")
-            elif event.key == K_2:
+                send(("handful", current_dice_type, dice_count))
+                telemetry.log("Switched to Tetrahedron")
+            elif replay is None and event.key == K_2:
                 current_dice_type = 6
-                dice = Dice(current_dice_type, size=1.5)
-                dice.position = [0, 3, 0]
-                print("Switched to Cube")
+                send(("handful", current_dice_type, dice_count))
+                telemetry.log("Switched to Cube")
+            elif replay is None and event.key in (K_EQUALS, K_PLUS, K_KP_PLUS, K_MINUS, K_KP_MINUS):
+                step = -1 if event.key in (K_MINUS, K_KP_MINUS) else 1
+                dice_count = max(1, min(MAX_DICE_COUNT, dice_count + step))
+                send(("handful", current_dice_type, dice_count))
+                telemetry.log(f"Dice: {dice_count}d{current_dice_type}")
+            elif replay is not None and event.key == K_LEFT:
+                seek(simulation.step_index - SNAPSHOT_INTERVAL)
+            elif replay is not None and event.key == K_RIGHT:
+                seek(simulation.step_index + SNAPSHOT_INTERVAL)
+            elif replay is not None and event.key == K_HOME:
+                seek(0)
+            elif event.key == K_p:
+                paused = not paused
+                telemetry.log(f"Paused: {paused}")
+            elif event.key == K_v:
+                telemetry.set_level(telemetry.level + 1)
             elif event.key == K_f:
                 flying_mode = not flying_mode
                 pygame.mouse.set_visible(not flying_mode)
                 if flying_mode:
                     pygame.mouse.set_pos(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
-                print(f"Flying mode: {flying_mode}")
+                telemetry.log(f"Flying mode: {flying_mode}")
 
     if flying_mode:
         mouse_dx, mouse_dy = pygame.mouse.get_rel()
@@ -551,39 +670,52 @@ def handle_input():
             camera_y += up_y * speed
 
 
-class CollisionSound:
-    def __init__(self):
-        self.current_state = False
-        self.parts = [os.path.join("sound", f"dub-{i}.mp3") for i in range(29)]
-        self.generator = self.get_by_part()
-
-    def get_by_part(self):
-        for dub in self.parts:
-            yield pygame.mixer.Sound(dub).play()
-
-    def play_sound(self, collision):
-        self.current_state = collision
-
-        try:
-            if self.current_state and not pygame.mixer.Channel(0).get_busy():
-                next(self.generator)
-        except StopIteration:
-            self.generator = self.get_by_part()
-
-
 def main():
-    global dice, current_dice_type, bounce_sound, camera_x, camera_y, camera_z, camera_yaw, camera_pitch, flying_mode, skybox_texture
+    global current_dice_type, dice_count, camera_x, camera_y, camera_z, camera_yaw, camera_pitch, flying_mode, skybox_texture, skybox_mesh
+    global text_batch, labels_state, collision_sound, static_scene
+    global simulation, recorder, replay, replay_diverged, paused, dice, dice_world, telemetry
+
+    parser = argparse.ArgumentParser(description='Бросок кубиков с детерминированной физикой.')
+    parser.add_argument('--seed', type=int, default=None, help='Сид бросков (по умолчанию случайный).')
+    parser.add_argument('--record', type=str, default=None, help='Записать входы и состояние в файл.')
+    parser.add_argument('--replay', type=str, default=None,
+                        help='Воспроизвести запись (стрелки - перемотка на секунду, Home - в начало).')
+    parser.add_argument('--seek', type=int, default=0, help='Шаг физики, с которого начать воспроизведение.')
+    parser.add_argument('--telemetry', type=str, default=None,
+                        help='Файл колоночной телеметрии (удары, результаты, энергия).')
+    parser.add_argument('--verbosity', type=int, choices=range(len(LEVEL_NAMES)), default=RESULTS,
+                        help='Подробность телеметрии: ' + ', '.join(f'{i} - {name}' for i, name in enumerate(LEVEL_NAMES))
+                             + '. Клавиша V переключает уровень.')
+    parser.add_argument('--compress-textures', action='store_true',
+                        help='Хранить текстуры в видеопамяти в сжатом формате.')
+    args = parser.parse_args()
+
+    telemetry = TelemetrySink(args.telemetry, level=args.verbosity)
+
     pygame.init()
     pygame.mixer.init()
-    bounce_sound = pygame.mixer.Sound("bounce.wav")
-    collision_sound = CollisionSound()
+    collision_sound = CollisionSound(telemetry=telemetry)
 
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), DOUBLEBUF | OPENGL)
     pygame.display.set_caption("Dice Rolling Simulation")
     current_dice_type = DEFAULT_DICE_TYPE
-    dice = Dice(current_dice_type, size=1.5)
-    dice.set_collision_hook(collision_sound.play_sound)
-    dice.position = [0, 3, 0]
+    dice_count = DEFAULT_DICE_COUNT
+    dice, dice_world = [], None
+    paused = False
+    replay_diverged = False
+
+    if args.replay:
+        replay = Replay(args.replay)
+        recorder = None
+        simulation = replay.simulation()
+        seek(args.seek)
+    else:
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        telemetry.log(f"Seed: {seed}")
+        replay = None
+        simulation = DiceSimulation(seed)
+        recorder = Recorder(args.record, seed) if args.record else None
+        send(("handful", current_dice_type, dice_count))
 
     camera_x = 0
     camera_y = 3
@@ -592,26 +724,39 @@ def main():
     camera_pitch = 20
     flying_mode = True
 
-    skybox_texture = load_texture("sky.jpg")
-    if skybox_texture is None:
-        pygame.quit()
-        sys.exit()
+    try:
+        skybox_texture = load_texture("sky.jpg", compress=args.compress_textures)
+    except (pygame.error, OSError) as e:
+        # Ошибка фатальная, поэтому печатается в stderr при любом уровне телеметрии (и при --verbosity 0)
+        print(f"Error loading texture sky.jpg: {e}", file=sys.stderr)
+        quit_simulation()
+    skybox_mesh = SkyboxMesh(SKYBOX_RADIUS)
+    static_scene = build_ground()
 
     init()
     reshape(WINDOW_WIDTH, WINDOW_HEIGHT)
 
+    text_batch = TextBatch(GlyphAtlas())
+    labels_state = None
+
     clock = pygame.time.Clock()
 
+    accumulator = 0.0
+
     while True:
-        dt = clock.tick(60) / 1000.0
-        substeps = 5
-        physics_dt = dt / substeps
+        # Физика идет шагами PHYSICS_DT независимо от длительности кадра,
+        # а отрисовка интерполирует позы между двумя последними шагами
+        accumulator += min(clock.tick(60) / 1000.0, MAX_FRAME_TIME)
 
         handle_input()
-
-        for _ in range(substeps):
-            dice.update(physics_dt)
-        display()
+        telemetry.tick()
+
+        if paused:
+            accumulator = 0.0
+        while accumulator >= PHYSICS_DT:
+            physics_step()
+            accumulator -= PHYSICS_DT
+        display(accumulator / PHYSICS_DT)
 
 
 if __name__ == "__main__":
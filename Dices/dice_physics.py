@@ -0,0 +1,1237 @@
+import math
+import numpy as np
+
+# --- Константы ---
+GRAVITY = -9.81
+RESTITUTION = 0.6
+FRICTION = 0.8
+STABLE_THRESHOLD = 0.98
+CONTACT_DISTANCE = 0.01
+
+# Итерации последовательных импульсов и скорость, ниже которой контакт считается покоящимся (без отскока)
+SOLVER_ITERATIONS = 4
+RESTING_SPEED = 0.5
+# До стольких контактов решатель считает на числах Python: на крошечных массивах вызовы NumPy дороже вычислений
+SCALAR_CONTACTS = 64
+# До стольких кубиков интегрирование и контакты с полом тоже считаются на числах Python
+SCALAR_BODIES = 16
+# Доля проникновения между кубиками, исправляемая за шаг, и допустимое проникновение
+POSITION_CORRECTION = 0.8
+PENETRATION_SLOP = 0.005
+# Вершины ближе этого расстояния к самой глубокой считаются одной гранью или ребром контакта
+FEATURE_TOLERANCE = 0.02
+
+# Порог остановки кубика
+SETTLE_TIME = 0.1
+SETTLE_VELOCITY = 0.1
+SETTLE_ANGULAR_VELOCITY = 5.0
+
+# --- Цвета граней ---
+RED = (1, 0, 0)
+GREEN = (0, 1, 0)
+BLUE = (0, 0, 1)
+WHITE = (1, 1, 1)
+
+
+# --- Геометрия ---
+
+def calculate_normal(v1, v2, v3):
+    edge1 = (v2[0] - v1[0], v2[1] - v1[1], v2[2] - v1[2])
+    edge2 = (v3[0] - v1[0], v3[1] - v1[1], v3[2] - v1[2])
+    normal = (
+        edge1[1] * edge2[2] - edge1[2] * edge2[1],
+        edge1[2] * edge2[0] - edge1[0] * edge2[2],
+        edge1[0] * edge2[1] - edge1[1] * edge2[0]
+    )
+    length = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
+    if length == 0: return (0, 0, 0)
+    return (normal[0] / length, normal[1] / length, normal[2] / length)
+
+
+def dice_geometry(num_sides, size):
+    """Возвращает (vertices, faces, normals, colors) кубика."""
+    if num_sides == 4:
+        s = size
+        vertices = [
+            (s, s, s), (s, -s, -s), (-s, s, -s), (-s, -s, s)
+        ]
+        faces = [
+            (0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)
+        ]
+        colors = [RED, GREEN, BLUE, WHITE]
+
+    elif num_sides == 6:
+        s = size / 2
+        vertices = [
+            (s, s, -s), (s, -s, -s), (-s, -s, -s), (-s, s, -s),
+            (s, s, s), (s, -s, s), (-s, -s, s), (-s, s, s)
+        ]
+        faces = [
+            (0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4),
+            (2, 3, 7, 6), (0, 3, 7, 4), (1, 2, 6, 5)
+        ]
+        colors = [
+            RED, GREEN, BLUE, WHITE,
+            (1, 0.5, 0), (0, 0.5, 1), (0.5, 0, 1), (1, 1, 0)
+        ]
+
+    else:
+        return [], [], [], []
+
+    normals = [calculate_normal(vertices[f[0]], vertices[f[1]], vertices[f[2]]) for f in faces]
+    # Обход вершин у граней разный, поэтому нормали разворачиваются наружу от центра
+    normals = [
+        n if sum(n[k] * sum(vertices[v][k] for v in f) for k in range(3)) >= 0 else (-n[0], -n[1], -n[2])
+        for n, f in zip(normals, faces)
+    ]
+    return vertices, faces, normals, colors
+
+
+def edge_directions(vertices, faces):
+    """Единичные направления ребер без повторов (с точностью до знака)."""
+    directions = []
+    for face in faces:
+        for a, b in zip(face, face[1:] + face[:1]):
+            d = np.subtract(vertices[b], vertices[a], dtype=float)
+            d /= np.linalg.norm(d)
+            if not any(abs(np.dot(d, e)) > 1 - 1e-6 for e in directions):
+                directions.append(d)
+    return np.array(directions).reshape(-1, 3)
+
+
+def dice_mass(num_sides):
+    if num_sides == 4:
+        return 0.8
+    return 1.0
+
+
+def inertia_diagonal(num_sides, size, mass):
+    """Диагональ тензора инерции (тензор у кубиков диагональный)."""
+    if num_sides == 6:
+        i = (1 / 6) * mass * size ** 2
+    elif num_sides == 4:
+        i = (1 / 20) * mass * size ** 2 * 5
+    else:
+        i = 1.0
+    return (i, i, i)
+
+
+def quaternion_multiply(a, b):
+    """Произведение кватернионов (N, 4) в порядке (w, x, y, z)."""
+    aw, ax, ay, az = a.T
+    bw, bx, by, bz = b.T
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=1)
+
+
+def rotation_quaternions(rotation_vectors):
+    """Кватернионы поворота на вектор (N, 3): ось - направление, угол в радианах - длина."""
+    angle = np.linalg.norm(rotation_vectors, axis=1)
+    half = angle / 2
+    # sin(a/2) / a, с пределом 1/2 при малых углах
+    scale = np.where(angle > 1e-12, np.sin(half) / np.where(angle > 1e-12, angle, 1.0), 0.5)
+    return np.column_stack([np.cos(half), rotation_vectors * scale[:, np.newaxis]])
+
+
+def quaternion_matrices(orientation):
+    """Матрицы поворота (N, 3, 3) из единичных кватернионов (N, 4)."""
+    w, x, y, z = orientation.T
+    matrices = np.empty((len(orientation), 3, 3))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - w * z)
+    matrices[:, 0, 2] = 2 * (x * z + w * y)
+    matrices[:, 1, 0] = 2 * (x * y + w * z)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - w * x)
+    matrices[:, 2, 0] = 2 * (x * z - w * y)
+    matrices[:, 2, 1] = 2 * (y * z + w * x)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrices
+
+
+# --- Контакты ---
+
+def cross(a, b):
+    """Векторное произведение по последней оси; np.cross слишком медленный для маленьких массивов."""
+    ax, ay, az = a[..., 0], a[..., 1], a[..., 2]
+    bx, by, bz = b[..., 0], b[..., 1], b[..., 2]
+    return np.stack([ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx], axis=-1)
+
+
+def matvec(matrices, vectors):
+    """Произведения (K, m, n) @ (K, n) -> (K, m); einsum на маленьких массивах заметно медленнее."""
+    return np.matmul(matrices, vectors[:, :, np.newaxis])[:, :, 0]
+
+
+def rotate(matrices, points):
+    """Поворот наборов точек (K, V, 3) матрицами (K, 3, 3): то же, что matvec для каждой точки."""
+    return np.matmul(points, matrices.transpose(0, 2, 1))
+
+
+def point_velocity(s, r):
+    """Скорость точки тела v + omega x r; s - шесть значений (v, omega), r - плечо."""
+    return (s[0] + s[4] * r[2] - s[5] * r[1],
+            s[1] + s[5] * r[0] - s[3] * r[2],
+            s[2] + s[3] * r[1] - s[4] * r[0])
+
+
+def velocity_change(inv_mass, response, p):
+    """Изменение (v, omega) тела от импульса p: p / m и I^-1 (r x p), response = I^-1 [r]x."""
+    px, py, pz = p
+    w = response
+    return (inv_mass * px, inv_mass * py, inv_mass * pz,
+            w[0] * px + w[1] * py + w[2] * pz,
+            w[3] * px + w[4] * py + w[5] * pz,
+            w[6] * px + w[7] * py + w[8] * pz)
+
+
+def quadratic_form(k, d):
+    """d @ k @ d для матрицы k из 9 значений по строкам."""
+    dx, dy, dz = d
+    return (dx * (k[0] * dx + k[1] * dy + k[2] * dz) + dy * (k[3] * dx + k[4] * dy + k[5] * dz)
+            + dz * (k[6] * dx + k[7] * dy + k[8] * dz))
+
+
+def contact_impulses(relative, normal, normal_mass, k, target, accumulated):
+    """
+    Импульсы для пачки контактов (K штук) между телами A и B.
+
+    Векторы - тройки столбцов (K,), матрицы - девять столбцов по строкам, поэтому
+    каждая операция идет сразу по всей пачке без маленьких матричных умножений.
+    relative - скорость точки контакта A относительно B, нормаль направлена от B к A.
+    normal_mass - эффективная масса вдоль нормали (0 - контакт между неподвижными телами),
+    k - обратная эффективная масса контакта: quadratic_form(k, d) вдоль направления d.
+
+    target - нормальная скорость разлета, к которой стремится контакт (отскок считается
+    один раз до итераций), accumulated - суммарный нормальный импульс контакта за прошлые
+    итерации. Ограничивается сумма, а не отдельный импульс, иначе последовательные удары
+    в нескольких вершинах добавляют энергию.
+
+    Returns:
+        impulse: (px, py, pz) импульс, приложенный к A (к B - с обратным знаком).
+        accumulated: (K,) новый суммарный нормальный импульс.
+    """
+    rx, ry, rz = relative
+    nx, ny, nz = normal
+    speed = rx * nx + ry * ny + rz * nz
+    total = np.maximum(accumulated + (target - speed) * normal_mass, 0.0)
+    normal_impulse = total - accumulated
+
+    # --- Трение (закон Кулона) ---
+    tx, ty, tz = rx - speed * nx, ry - speed * ny, rz - speed * nz
+    tangent_speed = np.sqrt(tx * tx + ty * ty + tz * tz)
+    length = np.where(tangent_speed > 1e-9, tangent_speed, 1.0)
+    tx, ty, tz = tx / length, ty / length, tz / length
+    # Для единичного направления обратная масса не меньше обратной массы тела A
+    tangent_inverse_mass = np.maximum(quadratic_form(k, (tx, ty, tz)), 1e-12)
+    friction_impulse = np.minimum(tangent_speed / tangent_inverse_mass, FRICTION * np.maximum(normal_impulse, 0.0))
+
+    impulse = (normal_impulse * nx - friction_impulse * tx,
+               normal_impulse * ny - friction_impulse * ty,
+               normal_impulse * nz - friction_impulse * tz)
+    return impulse, total
+
+
+def times_cross(m, r):
+    """m @ [r]x для матрицы 3x3, заданной 9 значениями по строкам (числами Python или столбцами NumPy)."""
+    rx, ry, rz = r
+    return (
+        m[1] * rz - m[2] * ry, m[2] * rx - m[0] * rz, m[0] * ry - m[1] * rx,
+        m[4] * rz - m[5] * ry, m[5] * rx - m[3] * rz, m[3] * ry - m[4] * rx,
+        m[7] * rz - m[8] * ry, m[8] * rx - m[6] * rz, m[6] * ry - m[7] * rx,
+    )
+
+
+def cross_times(r, m):
+    """[r]x @ m: каждый столбец m векторно умножается на r слева."""
+    rx, ry, rz = r
+    return (
+        ry * m[6] - rz * m[3], ry * m[7] - rz * m[4], ry * m[8] - rz * m[5],
+        rz * m[0] - rx * m[6], rz * m[1] - rx * m[7], rz * m[2] - rx * m[8],
+        rx * m[3] - ry * m[0], rx * m[4] - ry * m[1], rx * m[5] - ry * m[2],
+    )
+
+
+def floor_normals(count):
+    """Нормали контактов с полом (count, 3); np.tile для этого заметно медленнее."""
+    normal = np.zeros((count, 3))
+    normal[:, 1] = 1.0
+    return normal
+
+
+def separation_targets(approach):
+    """Скорость разлета после удара: отскок только для быстрых контактов."""
+    return np.where(approach < -RESTING_SPEED, -RESTITUTION * approach, 0.0)
+
+
+def world_inverse_inertia(matrices, inv_inertia):
+    """R * diag(inv_inertia) * R^T для каждого тела."""
+    return np.matmul(matrices * inv_inertia[:, np.newaxis, :], matrices.transpose(0, 2, 1))
+
+
+def contact_batches(first, second, movable):
+    """
+    Делит контакты на пачки, в которых каждое подвижное тело встречается не больше одного раза.
+
+    Пачка решается одной векторной операцией, а пачки идут последовательно,
+    как в обычном решателе последовательных импульсов. Неподвижные тела (пол,
+    уснувшие кубики; movable[i] = False) могут входить в пачку сколько угодно раз:
+    их скорости не меняются, поэтому порядок таких контактов не важен.
+
+    Returns:
+        Список массивов индексов контактов.
+    """
+    remaining = np.arange(len(first))
+    batches = []
+    while len(remaining):
+        a, b = first[remaining], second[remaining]
+        rows = np.arange(len(remaining))
+        bodies = np.concatenate([a, b])
+        owners = np.concatenate([rows, rows])
+        dynamic = movable[bodies]
+
+        # Контакт берется, если он первый из оставшихся для обоих своих подвижных тел
+        earliest = np.full(len(movable), len(remaining))
+        np.minimum.at(earliest, bodies[dynamic], owners[dynamic])
+        chosen = (~movable[a] | (earliest[a] == rows)) & (~movable[b] | (earliest[b] == rows))
+
+        batches.append(remaining[chosen])
+        remaining = remaining[~chosen]
+    return batches
+
+
+def sat_contacts(vertices_a, vertex_mask_a, normals_a, normal_mask_a, edges_a, edge_mask_a,
+                 vertices_b, vertex_mask_b, normals_b, normal_mask_b, edges_b, edge_mask_b):
+    """
+    Проверка пересечения P пар выпуклых многогранников теоремой о разделяющей оси.
+
+    Оси: нормали граней обоих тел и попарные произведения направлений ребер.
+    Все массивы в мировых координатах и дополнены до общего размера; маски отмечают реальные элементы.
+
+    Returns:
+        hit: (P,) пары пересекаются.
+        normal: (P, 3) нормаль от B к A.
+        depth: (P,) глубина проникновения.
+    """
+    pairs = len(vertices_a)
+    edge_pairs = edges_a.shape[1] * edges_b.shape[1]
+    edge_axes = cross(edges_a[:, :, np.newaxis, :], edges_b[:, np.newaxis, :, :]).reshape(pairs, edge_pairs, 3)
+    edge_lengths = np.linalg.norm(edge_axes, axis=2)
+    edge_valid = ((edge_mask_a[:, :, np.newaxis] & edge_mask_b[:, np.newaxis, :]).reshape(pairs, edge_pairs)
+                  & (edge_lengths > 1e-6))
+    edge_axes = edge_axes / np.where(edge_valid, edge_lengths, 1.0)[..., np.newaxis]
+
+    axes = np.concatenate([normals_a, normals_b, edge_axes], axis=1)
+    axis_valid = np.concatenate([normal_mask_a, normal_mask_b, edge_valid], axis=1)
+
+    projection_a = np.matmul(vertices_a, axes.transpose(0, 2, 1))
+    projection_b = np.matmul(vertices_b, axes.transpose(0, 2, 1))
+    mask_a = vertex_mask_a[..., np.newaxis]
+    mask_b = vertex_mask_b[..., np.newaxis]
+    overlap = (np.minimum(np.where(mask_a, projection_a, -np.inf).max(axis=1),
+                          np.where(mask_b, projection_b, -np.inf).max(axis=1))
+               - np.maximum(np.where(mask_a, projection_a, np.inf).min(axis=1),
+                            np.where(mask_b, projection_b, np.inf).min(axis=1)))
+    overlap = np.where(axis_valid, overlap, np.inf)
+
+    hit = np.all(overlap >= 0, axis=1)
+    best = np.argmin(overlap, axis=1)
+    normal = axes[np.arange(pairs), best]
+    depth = overlap[np.arange(pairs), best]
+
+    # Нормаль разворачивается от B к A
+    center_a = np.sum(vertices_a * mask_a, axis=1) / vertex_mask_a.sum(axis=1)[:, np.newaxis]
+    center_b = np.sum(vertices_b * mask_b, axis=1) / vertex_mask_b.sum(axis=1)[:, np.newaxis]
+    flip = np.sum(normal * (center_a - center_b), axis=1) < 0
+    normal = np.where(flip[:, np.newaxis], -normal, normal)
+    return hit, normal, depth
+
+
+def contact_points(vertices_a, vertex_mask_a, vertices_b, vertex_mask_b, normal, tolerance=FEATURE_TOLERANCE):
+    """
+    Точки контакта пересекающихся пар.
+
+    Ближайшие друг к другу элементы тел вдоль нормали - вершина, ребро или грань.
+    Берутся вершины элемента с меньшим числом вершин (он лежит на большем элементе
+    другого тела): вершина на грани дает одну точку, грань на грани - несколько,
+    что нужно для устойчивой стопки. Для ребра на ребре - одна точка посередине.
+
+    Returns:
+        pair: (C,) номер пары для каждой точки.
+        point: (C, 3) точки контакта.
+    """
+    projection_a = matvec(vertices_a, normal)
+    projection_b = matvec(vertices_b, normal)
+    lowest_a = np.where(vertex_mask_a, projection_a, np.inf).min(axis=1)
+    highest_b = np.where(vertex_mask_b, projection_b, -np.inf).max(axis=1)
+
+    feature_a = vertex_mask_a & (projection_a < lowest_a[:, np.newaxis] + tolerance)
+    feature_b = vertex_mask_b & (projection_b > highest_b[:, np.newaxis] - tolerance)
+    count_a = feature_a.sum(axis=1)
+    count_b = feature_b.sum(axis=1)
+    edge_edge = (count_a == 2) & (count_b == 2)
+    use_a = (count_a <= count_b) & ~edge_edge
+
+    # Точки ставятся посередине между телами
+    depth_a = highest_b[:, np.newaxis] - projection_a
+    depth_b = projection_b - lowest_a[:, np.newaxis]
+    points_a = vertices_a + (depth_a / 2)[..., np.newaxis] * normal[:, np.newaxis, :]
+    points_b = vertices_b - (depth_b / 2)[..., np.newaxis] * normal[:, np.newaxis, :]
+
+    pair_a, vertex_a = np.nonzero(feature_a & use_a[:, np.newaxis])
+    pair_b, vertex_b = np.nonzero(feature_b & ~use_a[:, np.newaxis] & ~edge_edge[:, np.newaxis])
+    pair_e = np.nonzero(edge_edge)[0]
+    middle = (np.sum(points_a[pair_e] * feature_a[pair_e, :, np.newaxis], axis=1)
+              + np.sum(points_b[pair_e] * feature_b[pair_e, :, np.newaxis], axis=1)) / 4
+
+    pair = np.concatenate([pair_a, pair_b, pair_e])
+    point = np.concatenate([points_a[pair_a, vertex_a], points_b[pair_b, vertex_b], middle])
+    return pair, point
+
+
+# --- Хранилище тел ---
+
+class StepEvents:
+    """
+    Результат шага для выбранных тел. Все массивы выровнены с indices.
+
+    bounce - был удар о пол, airborne - кубик не касается пола, settled - кубик только что остановился.
+    """
+
+    def __init__(self, indices, bounce, airborne, settled):
+        self.indices = indices
+        self.bounce = bounce
+        self.airborne = airborne
+        self.settled = settled
+
+
+class DiceBodies:
+    """
+    Состояние N кубиков в виде структуры массивов.
+
+    Геометрия разных типов кубиков дополняется до общего числа вершин и граней,
+    лишние элементы отмечаются масками. Шаг step() обрабатывает все катящиеся кубики
+    пакетными операциями NumPy.
+    """
+
+    def __init__(self, capacity=8):
+        # Меняется при каждом засыпании или пробуждении (для кешей по спящим кубикам)
+        self.sleep_version = 0
+        self.count = 0
+        self.capacity = 0
+        self.max_vertices = 0
+        self.max_faces = 0
+        self.max_edges = 0
+        self.allocate(capacity, 8, 6, 6)
+
+    def allocate(self, capacity, max_vertices, max_faces, max_edges):
+        old_count = self.count
+        old = self.__dict__.copy() if self.capacity else None
+
+        self.capacity = capacity
+        self.max_vertices = max_vertices
+        self.max_faces = max_faces
+        self.max_edges = max_edges
+
+        self.position = np.zeros((capacity, 3))
+        self.velocity = np.zeros((capacity, 3))
+        # Ориентация - единичный кватернион (w, x, y, z), matrices - его матрица поворота,
+        # пересчитываемая один раз за шаг
+        self.orientation = np.tile([1.0, 0.0, 0.0, 0.0], (capacity, 1))
+        self.matrices = np.tile(np.eye(3), (capacity, 1, 1))
+        self.angular_velocity = np.zeros((capacity, 3))
+        self.mass = np.ones(capacity)
+        self.inertia = np.ones((capacity, 3))
+        self.inv_inertia = np.ones((capacity, 3))
+        self.num_sides = np.zeros(capacity, dtype=np.int64)
+        self.size = np.ones(capacity)
+        self.radius = np.zeros(capacity)
+        self.vertices = np.zeros((capacity, max_vertices, 3))
+        self.vertex_mask = np.zeros((capacity, max_vertices), dtype=bool)
+        self.normals = np.zeros((capacity, max_faces, 3))
+        self.normal_mask = np.zeros((capacity, max_faces), dtype=bool)
+        # Направления ребер без повторов - оси SAT
+        self.edges = np.zeros((capacity, max_edges, 3))
+        self.edge_mask = np.zeros((capacity, max_edges), dtype=bool)
+        self.is_rolling = np.zeros(capacity, dtype=bool)
+        self.is_sleeping = np.zeros(capacity, dtype=bool)
+        self.grounded_timer = np.zeros(capacity)
+        self.result = np.zeros(capacity, dtype=np.int64)
+        # Номер острова уснувших вместе кубиков, -1 - кубик не спит
+        self.island = np.full(capacity, -1, dtype=np.int64)
+
+        # Переносим уже добавленные кубики в новые массивы
+        if old is not None:
+            for name, value in old.items():
+                if isinstance(value, np.ndarray):
+                    region = (slice(0, old_count),) + tuple(slice(0, n) for n in value.shape[1:])
+                    getattr(self, name)[region] = value[:old_count]
+
+    def add(self, num_sides, size=1.0):
+        """Добавляет кубик и возвращает его индекс."""
+        vertices, faces, normals, _ = dice_geometry(num_sides, size)
+        edges = edge_directions(vertices, faces)
+        if (self.count == self.capacity or len(vertices) > self.max_vertices
+                or len(normals) > self.max_faces or len(edges) > self.max_edges):
+            self.allocate(max(self.capacity * 2, 1), max(self.max_vertices, len(vertices)),
+                          max(self.max_faces, len(normals)), max(self.max_edges, len(edges)))
+
+        i = self.count
+        self.count += 1
+
+        mass = dice_mass(num_sides)
+        inertia = np.array(inertia_diagonal(num_sides, size, mass))
+        self.num_sides[i] = num_sides
+        self.size[i] = size
+        self.mass[i] = mass
+        self.inertia[i] = inertia
+        self.inv_inertia[i] = np.where(inertia != 0, 1.0 / np.where(inertia != 0, inertia, 1.0), 0.0)
+        self.vertices[i] = 0
+        self.vertices[i, :len(vertices)] = vertices
+        self.vertex_mask[i] = False
+        self.vertex_mask[i, :len(vertices)] = True
+        self.normals[i] = 0
+        self.normals[i, :len(normals)] = normals
+        self.normal_mask[i] = False
+        self.normal_mask[i, :len(normals)] = True
+        self.edges[i] = 0
+        self.edges[i, :len(edges)] = edges
+        self.edge_mask[i] = False
+        self.edge_mask[i, :len(edges)] = True
+        self.radius[i] = np.max(np.linalg.norm(vertices, axis=1))
+        self.reset(i)
+        return i
+
+    def reset(self, i):
+        self.position[i] = 0
+        self.velocity[i] = 0
+        self.set_orientation(i, [1.0, 0.0, 0.0, 0.0])
+        self.angular_velocity[i] = 0
+        self.is_rolling[i] = False
+        self.is_sleeping[i] = False
+        self.grounded_timer[i] = 0
+        self.result[i] = 0
+        self.island[i] = -1
+        self.sleep_version += 1
+
+    def start_roll(self, i, initial_velocity, initial_angular_velocity):
+        self.velocity[i] = initial_velocity
+        self.angular_velocity[i] = initial_angular_velocity
+        self.is_rolling[i] = True
+        self.result[i] = 0
+        self.is_sleeping[i] = False
+        self.grounded_timer[i] = 0
+        self.island[i] = -1
+        self.sleep_version += 1
+
+    def set_orientation(self, i, quaternion):
+        quaternion = np.asarray(quaternion, dtype=float)
+        self.orientation[i] = quaternion / np.linalg.norm(quaternion)
+        self.matrices[i] = quaternion_matrices(self.orientation[i][np.newaxis])[0]
+
+    def world_normals(self, indices):
+        return rotate(self.matrices[indices], self.normals[indices])
+
+    def face_scores(self, indices):
+        """Насколько грань смотрит вверх; у D4 результат - грань на полу, поэтому знак обратный."""
+        up = self.world_normals(indices)[..., 1]
+        tetrahedron = (self.num_sides[indices] == 4)[:, np.newaxis]
+        score = np.where(tetrahedron, -up, up)
+        return np.where(self.normal_mask[indices], score, -np.inf)
+
+    def is_stable(self, indices):
+        return np.any(self.face_scores(indices) >= STABLE_THRESHOLD, axis=1)
+
+    def determine_result(self, indices):
+        """Номер грани, смотрящей вверх (у D4 - грани, лежащей на полу)."""
+        self.result[indices] = np.argmax(self.face_scores(indices), axis=1) + 1
+        return self.result[indices]
+
+    def active_indices(self, indices=None):
+        active = self.is_rolling[:self.count] & ~self.is_sleeping[:self.count]
+        if indices is not None:
+            selected = np.zeros(self.count, dtype=bool)
+            selected[indices] = True
+            active &= selected
+        return np.nonzero(active)[0]
+
+    def step(self, dt, plane_y=-2, indices=None):
+        """
+        Делает шаг для катящихся кубиков (всех или только из indices) без столкновений между ними.
+
+        Returns:
+            StepEvents для обработанных кубиков.
+        """
+        idx = self.active_indices(indices)
+        if len(idx) == 0:
+            empty = np.zeros(0, dtype=bool)
+            return StepEvents(idx, empty, empty, empty)
+
+        self.integrate(idx, dt)
+        bounce, in_contact = self.solve_floor(idx, plane_y)
+        settled = self.update_rest(idx, in_contact, dt)
+        return StepEvents(idx, bounce, ~in_contact, settled)
+
+    def integrate(self, idx, dt):
+        if len(idx) <= SCALAR_BODIES:
+            self.integrate_few(idx, dt)
+            return
+
+        # --- Гравитация ---
+        self.velocity[idx, 1] += GRAVITY * dt
+
+        # --- Обновление позиции и вращения ---
+        # Угловая скорость задана в градусах в секунду в мировых осях
+        self.position[idx] += self.velocity[idx] * dt
+        orientation = quaternion_multiply(
+            rotation_quaternions(np.radians(self.angular_velocity[idx]) * dt), self.orientation[idx]
+        )
+        orientation /= np.linalg.norm(orientation, axis=1)[:, np.newaxis]
+        self.orientation[idx] = orientation
+        # Матрица поворота считается один раз и используется для столкновений, проверки остановки и отрисовки
+        self.matrices[idx] = quaternion_matrices(orientation)
+
+    def integrate_few(self, idx, dt):
+        """integrate на числах Python для нескольких кубиков: те же формулы без накладных расходов NumPy."""
+        for i in idx.tolist():
+            vx, vy, vz = self.velocity[i].tolist()
+            vy += GRAVITY * dt
+            self.velocity[i, 1] = vy
+            x, y, z = self.position[i].tolist()
+            self.position[i] = (x + vx * dt, y + vy * dt, z + vz * dt)
+
+            # Поворот на вектор omega * dt: sin(a/2) / a, с пределом 1/2 при малых углах
+            ax, ay, az = (math.radians(w) * dt for w in self.angular_velocity[i].tolist())
+            angle = math.sqrt(ax * ax + ay * ay + az * az)
+            scale = math.sin(angle / 2) / angle if angle > 1e-12 else 0.5
+            rw, rx, ry, rz = math.cos(angle / 2), ax * scale, ay * scale, az * scale
+            qw, qx, qy, qz = self.orientation[i].tolist()
+            w = rw * qw - rx * qx - ry * qy - rz * qz
+            x = rw * qx + rx * qw + ry * qz - rz * qy
+            y = rw * qy - rx * qz + ry * qw + rz * qx
+            z = rw * qz + rx * qy - ry * qx + rz * qw
+            norm = math.sqrt(w * w + x * x + y * y + z * z)
+            w, x, y, z = w / norm, x / norm, y / norm, z / norm
+            self.orientation[i] = (w, x, y, z)
+            self.matrices[i] = (
+                (1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)),
+                (2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)),
+                (2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)),
+            )
+
+    def world_vertices(self, indices):
+        """Вершины в мировых координатах (N, max_vertices, 3); лишние - по маске vertex_mask."""
+        rotated = rotate(self.matrices[indices], self.vertices[indices])
+        return rotated + self.position[indices, np.newaxis, :]
+
+    def floor_contacts(self, idx, plane_y):
+        """
+        Вершины кубиков, касающиеся пола.
+
+        Returns:
+            body: (C,) индексы кубиков, point: (C, 3) точки контакта,
+            depth: (len(idx),) наибольшее проникновение каждого кубика в пол (0, если его нет).
+        """
+        if len(idx) <= SCALAR_BODIES:
+            return self.floor_contacts_few(idx, plane_y)
+
+        # Кубик, центр которого выше пола больше чем на радиус, пола не касается: в полете
+        # большинство кубиков, и их вершины не поворачиваются
+        close = self.position[idx, 1] - self.radius[idx] < plane_y + CONTACT_DISTANCE
+        near = idx[close]
+        depth = np.zeros(len(idx))
+        if len(near) == 0:
+            return near, np.zeros((0, 3)), depth
+
+        vertices = self.world_vertices(near)
+        distance = np.where(self.vertex_mask[near], vertices[..., 1] - plane_y, np.inf)
+        row, vertex = np.nonzero(distance < CONTACT_DISTANCE)
+        depth[close] = np.maximum(-distance.min(axis=1), 0.0)
+        return near[row], vertices[row, vertex], depth
+
+    def floor_contacts_few(self, idx, plane_y):
+        """floor_contacts на числах Python для нескольких кубиков."""
+        body, point, depth = [], [], []
+        for i in idx.tolist():
+            x, y, z = self.position[i].tolist()
+            if y - self.radius[i] >= plane_y + CONTACT_DISTANCE:
+                depth.append(0.0)
+                continue
+            r0, r1, r2 = self.matrices[i].tolist()
+            lowest = math.inf
+            for (vx, vy, vz), real in zip(self.vertices[i].tolist(), self.vertex_mask[i].tolist()):
+                if not real:
+                    continue
+                height = r1[0] * vx + r1[1] * vy + r1[2] * vz + y
+                lowest = min(lowest, height - plane_y)
+                if height - plane_y < CONTACT_DISTANCE:
+                    body.append(i)
+                    point.append((r0[0] * vx + r0[1] * vy + r0[2] * vz + x, height,
+                                  r2[0] * vx + r2[1] * vy + r2[2] * vz + z))
+            depth.append(max(-lowest, 0.0))
+        return np.array(body, dtype=np.int64), np.array(point).reshape(-1, 3), np.array(depth)
+
+    def contact_bodies(self, first, second):
+        """
+        Компактная нумерация тел контактов: только участвующие кубики и пол после них.
+
+        Returns:
+            bodies: индексы кубиков, first и second в новой нумерации (пол - len(bodies)).
+        """
+        bodies = np.unique(np.concatenate([first, second[second >= 0]]))
+        static = len(bodies)
+        return (bodies, np.searchsorted(bodies, first),
+                np.where(second < 0, static, np.searchsorted(bodies, np.maximum(second, 0))))
+
+    def contact_velocities(self, bodies):
+        """Скорости, угловые скорости (рад/с) и позиции тел с нулевой строкой пола в конце."""
+        zero = np.zeros((1, 3))
+        velocity = np.vstack([self.velocity[bodies], zero])
+        omega = np.radians(np.vstack([self.angular_velocity[bodies], zero]))
+        position = np.vstack([self.position[bodies], zero])
+        return velocity, omega, position
+
+    def approach_speeds(self, first, second, normal, point):
+        """Нормальная скорость сближения в точках контакта (second = -1 - пол)."""
+        bodies, first, second = self.contact_bodies(first, second)
+        velocity, omega, position = self.contact_velocities(bodies)
+        relative = (velocity[first] + cross(omega[first], point - position[first])
+                    - velocity[second] - cross(omega[second], point - position[second]))
+        return np.sum(relative * normal, axis=1)
+
+    def solve_contacts(self, first, second, normal, point):
+        """
+        Решает контакты последовательными импульсами с накоплением.
+        Уснувшие кубики в решателе неподвижны, как пол.
+
+        Считаются только тела, участвующие в контактах, поэтому стоимость
+        не зависит от числа лежащих в стороне кубиков.
+
+        Args:
+            first, second: индексы тел контакта; second = -1 - пол.
+            normal: (C, 3) нормали от second к first.
+            point: (C, 3) точки контакта в мировых координатах.
+
+        Returns:
+            approach: (C,) нормальная скорость сближения до решения.
+        """
+        if len(first) <= SCALAR_CONTACTS:
+            return self.solve_few_contacts(first, second, normal, point)
+
+        bodies, first, second = self.contact_bodies(first, second)
+        static = len(bodies)
+
+        # Скорости тел s = (v, omega) - шесть строк по столбцу на тело; пол - дополнительный
+        # столбец с нулевыми скоростью, обратными массой и инерцией. Величины контактов - кортежи
+        # столбцов (C,): формулы те же, что у solve_few_contacts, но сразу для всех контактов
+        state = np.zeros((6, static + 1))
+        state[:3, :static] = self.velocity[bodies].T
+        state[3:, :static] = np.radians(self.angular_velocity[bodies]).T
+        position = np.zeros((static + 1, 3))
+        position[:static] = self.position[bodies]
+        movable = np.zeros(static + 1, dtype=bool)
+        movable[:static] = ~self.is_sleeping[bodies]
+        inv_mass = np.zeros(static + 1)
+        inv_mass[:static] = np.where(movable[:static], 1.0 / self.mass[bodies], 0.0)
+        inv_inertia = np.zeros((static + 1, 9))
+        inv_inertia[:static] = (world_inverse_inertia(self.matrices[bodies], self.inv_inertia[bodies]).reshape(-1, 9)
+                                * movable[:static, np.newaxis])
+
+        normal = tuple(normal.T)
+        r_a, r_b = tuple((point - position[first]).T), tuple((point - position[second]).T)
+        response_a = times_cross(tuple(inv_inertia[first].T), r_a)
+        response_b = times_cross(tuple(inv_inertia[second].T), r_b)
+        angular_a, angular_b = cross_times(r_a, response_a), cross_times(r_b, response_b)
+        linear = inv_mass[first] + inv_mass[second]
+        k = tuple((linear if i % 4 == 0 else 0.0) - angular_a[i] - angular_b[i] for i in range(9))
+
+        relative = np.subtract(point_velocity(state[:, first], r_a), point_velocity(state[:, second], r_b))
+        approach = relative[0] * normal[0] + relative[1] * normal[1] + relative[2] * normal[2]
+        target = separation_targets(approach)
+        normal_inverse_mass = quadratic_form(k, normal)
+        normal_mass = 1.0 / np.where(normal_inverse_mass > 1e-12, normal_inverse_mass, np.inf)
+
+        # Все, что не меняется между итерациями, выбирается по пачкам один раз - одной таблицей строк;
+        # у пачки, где все тела B неподвижны (пол, уснувшие), B не читается и не обновляется
+        table = np.array(r_a + r_b + response_a + response_b + k + normal
+                         + (inv_mass[first], inv_mass[second], normal_mass, target))
+        batches = []
+        for rows in contact_batches(first, second, movable):
+            b = second[rows]
+            c = table[:, rows]
+            batches.append((first[rows], b if movable[b].any() else None,
+                            tuple(c[0:3]), tuple(c[3:6]), tuple(c[6:15]), tuple(c[15:24]), tuple(c[24:33]),
+                            tuple(c[33:36]), c[36], c[37], c[38], c[39]))
+        accumulated = [np.zeros(len(batch[0])) for batch in batches]
+
+        for iteration in range(SOLVER_ITERATIONS):
+            for j, (a, b, r_a, r_b, response_a, response_b, k, normal,
+                    inv_mass_a, inv_mass_b, normal_mass, target) in enumerate(batches):
+                state_a = state.take(a, axis=1)
+                relative = point_velocity(state_a, r_a)
+                if b is not None:
+                    state_b = state.take(b, axis=1)
+                    relative = np.subtract(relative, point_velocity(state_b, r_b))
+                impulse, accumulated[j] = contact_impulses(
+                    relative, normal, normal_mass, k, target, accumulated[j]
+                )
+                # В пачке подвижные тела не повторяются, поэтому новые скорости просто записываются
+                # на место (это быстрее, чем +=); у пола и уснувших изменения нулевые
+                state[:, a] = state_a + velocity_change(inv_mass_a, response_a, impulse)
+                if b is not None:
+                    state[:, b] = state_b - velocity_change(inv_mass_b, response_b, impulse)
+
+        self.velocity[bodies] = state[:3, :static].T
+        self.angular_velocity[bodies] = np.degrees(state[3:, :static].T)
+        return approach
+
+    def solve_few_contacts(self, first, second, normal, point):
+        """
+        solve_contacts на числах Python для нескольких контактов.
+
+        Контакты решаются по порядку номеров. Для каждого подвижного тела это тот же
+        порядок, что у пачек векторного решателя, а контакты без общих подвижных тел
+        не влияют друг на друга, поэтому результат совпадает с точностью до округления.
+        На паре десятков чисел NumPy тратит на вызовы больше времени, чем на сами вычисления.
+        """
+        first, second = first.tolist(), second.tolist()
+        normal, point = normal.tolist(), point.tolist()
+
+        # Скорости тел (v, omega) изменяемыми списками; пол и уснувшие кубики неподвижны.
+        # Матрицы 3x3 - кортежи из 9 чисел по строкам
+        state = {-1: [0.0] * 6}
+        inv_mass = {-1: 0.0}
+        inv_inertia = {-1: None}
+        position = {-1: (0.0, 0.0, 0.0)}
+        ids = list(set(first + second) - {-1})
+        for i, velocity, omega, body_position, body_inv_mass, body_inv_inertia, sleeping in zip(
+                ids, self.velocity[ids].tolist(), np.radians(self.angular_velocity[ids]).tolist(),
+                self.position[ids].tolist(), (1.0 / self.mass[ids]).tolist(),
+                world_inverse_inertia(self.matrices[ids], self.inv_inertia[ids]).reshape(-1, 9).tolist(),
+                self.is_sleeping[ids].tolist()):
+            state[i] = velocity + omega
+            position[i] = body_position
+            inv_mass[i], inv_inertia[i] = (0.0, None) if sleeping else (body_inv_mass, tuple(body_inv_inertia))
+
+        # Постоянные за шаг величины контакта: отклики тел I^-1 [r]x и обратная эффективная масса k
+        zero = (0.0,) * 9
+        contacts = []
+        approach = [0.0] * len(first)
+        for c in range(len(first)):
+            a, b = first[c], second[c]
+            nx, ny, nz = normal[c]
+            px, py, pz = point[c]
+            rax, ray, raz = px - position[a][0], py - position[a][1], pz - position[a][2]
+            rbx, rby, rbz = px - position[b][0], py - position[b][1], pz - position[b][2]
+            response_a = times_cross(inv_inertia[a], (rax, ray, raz)) if inv_mass[a] else zero
+            response_b = times_cross(inv_inertia[b], (rbx, rby, rbz)) if inv_mass[b] else zero
+            angular_a = cross_times((rax, ray, raz), response_a) if inv_mass[a] else zero
+            angular_b = cross_times((rbx, rby, rbz), response_b) if inv_mass[b] else zero
+            linear = inv_mass[a] + inv_mass[b]
+            k = (linear - angular_a[0] - angular_b[0], -angular_a[1] - angular_b[1], -angular_a[2] - angular_b[2],
+                 -angular_a[3] - angular_b[3], linear - angular_a[4] - angular_b[4], -angular_a[5] - angular_b[5],
+                 -angular_a[6] - angular_b[6], -angular_a[7] - angular_b[7], linear - angular_a[8] - angular_b[8])
+
+            sa, sb = state[a], state[b]
+            speed = ((sa[0] + sa[4] * raz - sa[5] * ray - sb[0] - sb[4] * rbz + sb[5] * rby) * nx
+                     + (sa[1] + sa[5] * rax - sa[3] * raz - sb[1] - sb[5] * rbx + sb[3] * rbz) * ny
+                     + (sa[2] + sa[3] * ray - sa[4] * rax - sb[2] - sb[3] * rby + sb[4] * rbx) * nz)
+            approach[c] = speed
+            normal_inverse_mass = (nx * (k[0] * nx + k[1] * ny + k[2] * nz) + ny * (k[3] * nx + k[4] * ny + k[5] * nz)
+                                   + nz * (k[6] * nx + k[7] * ny + k[8] * nz))
+            contacts.append((sa, inv_mass[a], response_a, rax, ray, raz, sb, inv_mass[b], response_b, rbx, rby, rbz,
+                             nx, ny, nz, 1.0 / normal_inverse_mass if normal_inverse_mass > 1e-12 else 0.0, k,
+                             -RESTITUTION * speed if speed < -RESTING_SPEED else 0.0))
+
+        accumulated = [0.0] * len(contacts)
+        for iteration in range(SOLVER_ITERATIONS):
+            for c, (sa, inv_mass_a, response_a, rax, ray, raz, sb, inv_mass_b, response_b, rbx, rby, rbz,
+                    nx, ny, nz, normal_mass, k, target) in enumerate(contacts):
+                # Скорость точки контакта A относительно B: v + omega x r
+                rx = sa[0] + sa[4] * raz - sa[5] * ray - sb[0] - sb[4] * rbz + sb[5] * rby
+                ry = sa[1] + sa[5] * rax - sa[3] * raz - sb[1] - sb[5] * rbx + sb[3] * rbz
+                rz = sa[2] + sa[3] * ray - sa[4] * rax - sb[2] - sb[3] * rby + sb[4] * rbx
+                speed = rx * nx + ry * ny + rz * nz
+                total = accumulated[c] + (target - speed) * normal_mass
+                total = total if total > 0.0 else 0.0
+                normal_impulse = total - accumulated[c]
+                accumulated[c] = total
+
+                # --- Трение (закон Кулона) ---
+                tx, ty, tz = rx - speed * nx, ry - speed * ny, rz - speed * nz
+                tangent_speed = math.sqrt(tx * tx + ty * ty + tz * tz)
+                if tangent_speed > 1e-9:
+                    tx, ty, tz = tx / tangent_speed, ty / tangent_speed, tz / tangent_speed
+                tangent_inverse_mass = (tx * (k[0] * tx + k[1] * ty + k[2] * tz) + ty * (k[3] * tx + k[4] * ty + k[5] * tz)
+                                        + tz * (k[6] * tx + k[7] * ty + k[8] * tz))
+                # Условные выражения вместо min/max: вызов встроенной функции здесь заметно дороже
+                friction_impulse = tangent_speed / (tangent_inverse_mass if tangent_inverse_mass > 1e-12 else 1e-12)
+                friction_limit = FRICTION * normal_impulse if normal_impulse > 0.0 else 0.0
+                friction_impulse = friction_impulse if friction_impulse < friction_limit else friction_limit
+
+                px = normal_impulse * nx - friction_impulse * tx
+                py = normal_impulse * ny - friction_impulse * ty
+                pz = normal_impulse * nz - friction_impulse * tz
+                if inv_mass_a:
+                    w = response_a
+                    sa[0] += inv_mass_a * px
+                    sa[1] += inv_mass_a * py
+                    sa[2] += inv_mass_a * pz
+                    sa[3] += w[0] * px + w[1] * py + w[2] * pz
+                    sa[4] += w[3] * px + w[4] * py + w[5] * pz
+                    sa[5] += w[6] * px + w[7] * py + w[8] * pz
+                if inv_mass_b:
+                    w = response_b
+                    sb[0] -= inv_mass_b * px
+                    sb[1] -= inv_mass_b * py
+                    sb[2] -= inv_mass_b * pz
+                    sb[3] -= w[0] * px + w[1] * py + w[2] * pz
+                    sb[4] -= w[3] * px + w[4] * py + w[5] * pz
+                    sb[5] -= w[6] * px + w[7] * py + w[8] * pz
+
+        for i, s in state.items():
+            if inv_mass.get(i):
+                self.velocity[i] = s[:3]
+                self.angular_velocity[i] = [math.degrees(w) for w in s[3:]]
+        return np.array(approach)
+
+    def solve_floor(self, idx, plane_y):
+        """
+        Контакты всех вершин с полом решаются последовательными импульсами.
+
+        Returns:
+            bounce: был удар (скорость сближения выше RESTING_SPEED).
+            in_contact: кубик касается пола.
+        """
+        body, point, depth = self.floor_contacts(idx, plane_y)
+        row = np.searchsorted(idx, body)
+        in_contact = np.zeros(len(idx), dtype=bool)
+        in_contact[row] = True
+        bounce = np.zeros(len(idx), dtype=bool)
+        if len(body) == 0:
+            return bounce, in_contact
+
+        approach = self.solve_contacts(body, np.full(len(body), -1), floor_normals(len(body)), point)
+        bounce[row[approach < -RESTING_SPEED]] = True
+
+        # Выталкиваем кубик из пола
+        self.position[idx, 1] += depth
+        return bounce, in_contact
+
+    def update_rest(self, idx, in_contact, dt, leaning=None):
+        """
+        Отмечает остановившиеся кубики и определяет их результат.
+
+        Кубик останавливается, лежа на грани; кубик из leaning (опирающийся на другой кубик)
+        может остановиться и наклонным - тогда результат дает самая верхняя грань.
+        """
+        grounded_timer = np.where(in_contact, self.grounded_timer[idx] + dt, 0.0)
+        self.grounded_timer[idx] = grounded_timer
+
+        # --- Проверка остановки ---
+        # Пока ни один кубик не лежит SETTLE_TIME, скорости не проверяются
+        settled = grounded_timer > SETTLE_TIME
+        if not settled.any():
+            return settled
+        settled &= (
+            (np.abs(self.velocity[idx]).max(axis=1) < SETTLE_VELOCITY)
+            & (np.abs(self.angular_velocity[idx]).max(axis=1) < SETTLE_ANGULAR_VELOCITY)
+        )
+        if np.any(settled):
+            stable = self.is_stable(idx[settled])
+            if leaning is not None:
+                stable |= leaning[settled]
+            settled[settled] = stable
+
+        if np.any(settled):
+            done = idx[settled]
+            self.is_rolling[done] = False
+            self.is_sleeping[done] = True
+            self.sleep_version += 1
+            self.determine_result(done)
+        return settled
+
+    def kinetic_energy(self, indices):
+        linear = 0.5 * self.mass[indices] * np.sum(self.velocity[indices] ** 2, axis=-1)
+        angular = 0.5 * np.sum(self.inertia[indices] * np.radians(self.angular_velocity[indices]) ** 2, axis=-1)
+        return linear + angular
+
+
+# --- Мир из многих кубиков ---
+
+def expand_ranges(start, counts):
+    """Индексы всех диапазонов [start, start + count) одним массивом."""
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(start, counts) + offsets
+
+
+def broad_phase_pairs(position, radius):
+    """
+    Sweep-and-prune по оси X: пары тел, чьи ограничивающие сферы пересекаются.
+
+    Сортировка O(N log N), дальше перебираются только тела с пересекающимися
+    интервалами по X, поэтому для горсти кубиков на столе стоимость близка к линейной.
+
+    Returns:
+        Массивы индексов (first, second) кандидатов в пары.
+    """
+    if len(position) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    lo = position[:, 0] - radius
+    hi = position[:, 0] + radius
+    order = np.argsort(lo)
+    lo_sorted = lo[order]
+
+    # Для каждого тела - сколько следующих по порядку тел начинается до его конца
+    ends = np.searchsorted(lo_sorted, hi[order], side='right')
+    counts = ends - np.arange(len(order)) - 1
+    first = np.repeat(np.arange(len(order)), counts)
+    second = expand_ranges(np.arange(len(order)) + 1, counts)
+    first, second = order[first], order[second]
+
+    distance = np.linalg.norm(position[first] - position[second], axis=1)
+    close = distance < radius[first] + radius[second]
+    return first[close], second[close]
+
+
+def connected_components(count, first, second):
+    """
+    Компоненты связности графа из count вершин с ребрами (first, second).
+
+    Каждая вершина получает наименьший номер в своей компоненте: метки
+    распространяются по ребрам, а переход по ссылке labels[labels] сокращает путь.
+    """
+    labels = np.arange(count)
+    while True:
+        low = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, low)
+        np.minimum.at(updated, second, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class DiceWorld:
+    """
+    Горсть кубиков (10d6, 50d4...), сталкивающихся друг с другом и с полом.
+
+    Шаг: интегрирование катящихся тел, широкая фаза (sweep-and-prune),
+    узкая фаза (SAT для выпуклых многогранников) и общий решатель импульсов
+    для контактов с полом и между кубиками.
+
+    Касающиеся друг друга кубики образуют остров. Остров засыпает целиком, когда
+    все его кубики лежат спокойно SETTLE_TIME; уснувшие кубики не интегрируются
+    и не проверяются на столкновения друг с другом, поэтому стоимость шага зависит
+    от числа катящихся кубиков. Удар по уснувшему кубику будит только его остров.
+    """
+
+    def __init__(self, plane_y=-2, capacity=8):
+        self.bodies = DiceBodies(capacity)
+        self.plane_y = plane_y
+        self.next_island = 0
+        # Уснувшие кубики, отсортированные по левой границе по X, и версия, для которой они собраны
+        self.sleeping_index = None
+        self.sleeping_version = None
+
+    def add(self, num_sides, size=1.0, position=(0, 0, 0)):
+        i = self.bodies.add(num_sides, size)
+        self.bodies.position[i] = position
+        return i
+
+    def sleeping_neighbours(self, idx):
+        """
+        Пары (катящийся, уснувший) с пересекающимися ограничивающими сферами.
+
+        Уснувшие кубики не двигаются, поэтому их порядок по X сортируется только
+        при засыпании или пробуждении, а катящиеся ищутся в нем двоичным поиском.
+        """
+        b = self.bodies
+        if self.sleeping_version != b.sleep_version:
+            sleeping = np.nonzero(b.is_sleeping[:b.count])[0]
+            lo = b.position[sleeping, 0] - b.radius[sleeping]
+            order = np.argsort(lo)
+            max_radius = b.radius[sleeping].max() if len(sleeping) else 0.0
+            self.sleeping_index = (sleeping[order], lo[order], max_radius)
+            self.sleeping_version = b.sleep_version
+
+        sleeping, lo, max_radius = self.sleeping_index
+        if len(sleeping) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        x, radius = b.position[idx, 0], b.radius[idx]
+        # Уснувший кубик пересекается по X, только если начинается не раньше x - r - 2 * max_radius
+        start = np.searchsorted(lo, x - radius - 2 * max_radius)
+        counts = np.searchsorted(lo, x + radius, side='right') - start
+        first = np.repeat(idx, counts)
+        second = sleeping[expand_ranges(start, counts)]
+
+        distance = np.linalg.norm(b.position[first] - b.position[second], axis=1)
+        close = distance < b.radius[first] + b.radius[second]
+        return first[close], second[close]
+
+    def pair_contacts(self, idx):
+        """
+        Контакты катящихся кубиков между собой и с уснувшими.
+
+        Returns:
+            first, second: (P,) пересекающиеся пары, normal: (P, 3) нормали от second к first,
+            depth: (P,) глубины, pair: (C,) и point: (C, 3) - точки контакта пар.
+        """
+        b = self.bodies
+        first, second = broad_phase_pairs(b.position[idx], b.radius[idx])
+        sleeping_first, sleeping_second = self.sleeping_neighbours(idx)
+        first = np.concatenate([idx[first], sleeping_first])
+        second = np.concatenate([idx[second], sleeping_second])
+        # Обычно кубики летят и катятся порознь: без кандидатов узкая фаза не нужна
+        if len(first) == 0:
+            return first, second, np.zeros((0, 3)), np.zeros(0), first, np.zeros((0, 3))
+
+        vertices_a, vertices_b = b.world_vertices(first), b.world_vertices(second)
+        hit, normal, depth = sat_contacts(
+            vertices_a, b.vertex_mask[first], b.world_normals(first), b.normal_mask[first],
+            rotate(b.matrices[first], b.edges[first]), b.edge_mask[first],
+            vertices_b, b.vertex_mask[second], b.world_normals(second), b.normal_mask[second],
+            rotate(b.matrices[second], b.edges[second]), b.edge_mask[second],
+        )
+        if not hit.any():
+            return first[hit], second[hit], normal[hit], depth[hit], first[hit], np.zeros((0, 3))
+        pair, point = contact_points(vertices_a[hit], b.vertex_mask[first[hit]],
+                                     vertices_b[hit], b.vertex_mask[second[hit]], normal[hit])
+        return first[hit], second[hit], normal[hit], depth[hit], pair, point
+
+    def step(self, dt):
+        """
+        Шаг мира для всех катящихся кубиков.
+
+        Returns:
+            StepEvents для кубиков, которые катились в начале шага.
+            bounce отмечает удар о пол или о другой кубик, settled - кубик уснул вместе со своим островом.
+        """
+        b = self.bodies
+        idx = b.active_indices()
+        if len(idx) == 0:
+            empty = np.zeros(0, dtype=bool)
+            return StepEvents(idx, empty, empty, empty)
+
+        b.integrate(idx, dt)
+
+        floor_body, floor_point, floor_depth = b.floor_contacts(idx, self.plane_y)
+        first, second, normal, depth, pair, pair_point = self.pair_contacts(idx)
+
+        # Уснувший остров просыпается только от удара; от касания он остается неподвижной опорой
+        if len(pair):
+            impact = b.approach_speeds(first[pair], second[pair], normal[pair], pair_point) < -RESTING_SPEED
+            self.wake(np.concatenate([first[pair[impact]], second[pair[impact]]]))
+
+        bodies_a = np.concatenate([floor_body, first[pair]])
+        bodies_b = np.concatenate([np.full(len(floor_body), -1), second[pair]])
+        normals = np.concatenate([floor_normals(len(floor_body)), normal[pair]])
+        approach = b.solve_contacts(bodies_a, bodies_b, normals, np.concatenate([floor_point, pair_point]))
+
+        # Выталкиваем кубики из пола и разводим пересекающиеся пропорционально обратным массам
+        b.position[idx, 1] += floor_depth
+        if len(first):
+            inv_mass_first = np.where(b.is_sleeping[first], 0.0, 1.0 / b.mass[first])
+            inv_mass_second = np.where(b.is_sleeping[second], 0.0, 1.0 / b.mass[second])
+            total = inv_mass_first + inv_mass_second
+            share = inv_mass_first / np.where(total > 0, total, 1.0)
+            correction = POSITION_CORRECTION * np.maximum(depth - PENETRATION_SLOP, 0.0)
+            np.add.at(b.position, first, (correction * share)[:, np.newaxis] * normal)
+            np.add.at(b.position, second, -(correction * (1 - share))[:, np.newaxis] * normal)
+
+        hits = approach < -RESTING_SPEED
+        in_contact = self.marked(idx, bodies_a, bodies_b)
+        leaning = self.marked(idx, first, second)
+        struck = self.marked(idx, bodies_a[hits], bodies_b[hits])
+
+        settled = self.update_islands(idx, in_contact, leaning, first, second, dt)
+        return StepEvents(idx, struck, ~in_contact, settled)
+
+    def marked(self, idx, *groups):
+        """
+        Для каждого кубика из idx - встречается ли он в одном из массивов groups.
+
+        Пол (-1) попадает в лишнюю последнюю ячейку и ни с одним кубиком не совпадает.
+        """
+        mark = np.zeros(self.bodies.count + 1, dtype=bool)
+        for group in groups:
+            mark[group] = True
+        return mark[idx]
+
+    def update_islands(self, idx, in_contact, leaning, first, second, dt):
+        """
+        Усыпляет острова, все кубики которых лежат спокойно.
+
+        Остров - компонента связности графа контактов этого шага среди катящихся кубиков
+        и коснувшихся их уснувших. Уснувшие соседи присоединяются к новому острову.
+
+        Returns:
+            settled: (len(idx),) кубик уснул на этом шаге.
+        """
+        b = self.bodies
+        grounded_timer = np.where(in_contact, b.grounded_timer[idx] + dt, 0.0)
+        b.grounded_timer[idx] = grounded_timer
+
+        # Кубик готов уснуть, если лежит на грани или опирается на другой кубик
+        resting = grounded_timer > SETTLE_TIME
+        if not resting.any():
+            return resting
+        resting &= (np.all(np.abs(b.velocity[idx]) < SETTLE_VELOCITY, axis=1)
+                    & np.all(np.abs(b.angular_velocity[idx]) < SETTLE_ANGULAR_VELOCITY, axis=1))
+        if np.any(resting):
+            resting[resting] = b.is_stable(idx[resting]) | leaning[resting]
+        if not np.any(resting):
+            return resting
+
+        # Вершины графа - катящиеся кубики и их соседи по контактам
+        nodes = np.unique(np.concatenate([idx, first, second]))
+        labels = connected_components(len(nodes), np.searchsorted(nodes, first), np.searchsorted(nodes, second))
+
+        # Разбуженные на этом шаге кубики не входят в idx и не готовы уснуть
+        ready = b.is_sleeping[nodes].copy()
+        ready[np.searchsorted(nodes, idx)] = resting
+        island_ready = np.ones(len(nodes), dtype=bool)
+        np.logical_and.at(island_ready, labels, ready)
+
+        falling = island_ready[labels] & ~b.is_sleeping[nodes]
+        if not np.any(falling):
+            return np.zeros(len(idx), dtype=bool)
+
+        # Новые номера островов; уснувшие соседи переходят в остров засыпающих кубиков
+        island = self.next_island + labels
+        self.next_island += len(nodes)
+        joined = island_ready[labels] & b.is_sleeping[nodes]
+        for old, new in set(zip(b.island[nodes[joined]].tolist(), island[joined].tolist())):
+            b.island[:b.count][b.island[:b.count] == old] = new
+
+        done = nodes[falling]
+        b.island[done] = island[falling]
+        b.is_rolling[done] = False
+        b.is_sleeping[done] = True
+        b.velocity[done] = 0
+        b.angular_velocity[done] = 0
+        b.sleep_version += 1
+        b.determine_result(done)
+        return falling[np.searchsorted(nodes, idx)]
+
+    def wake(self, indices):
+        """Будит острова уснувших кубиков из indices."""
+        b = self.bodies
+        islands = np.unique(b.island[indices[b.is_sleeping[indices]]])
+        if len(islands) == 0:
+            return
+
+        woken = np.nonzero(np.isin(b.island[:b.count], islands))[0]
+        b.is_sleeping[woken] = False
+        b.is_rolling[woken] = True
+        b.grounded_timer[woken] = 0
+        b.island[woken] = -1
+        b.result[woken] = 0
+        b.sleep_version += 1
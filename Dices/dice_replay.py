@@ -0,0 +1,281 @@
+import json
+import math
+import random
+import struct
+import zlib
+
+import numpy as np
+
+from dice_physics import DiceWorld
+
+# Фиксированный шаг физики: результат не зависит от частоты кадров
+PHYSICS_DT = 1 / 300
+# Полный снимок состояния раз в столько шагов (1 секунда)
+SNAPSHOT_INTERVAL = 300
+
+DICE_SIZE = 1.5
+
+# Версия 2: снимки - явные массивы вместо pickle
+MAGIC = b"DICEREC2"
+# Запись: тип (1 байт), номер шага, длина данных
+RECORD_HEADER = struct.Struct("<cII")
+INPUT = b"I"
+SNAPSHOT = b"S"
+STATES = b"T"
+
+# Массивы DiceBodies, которые входят в снимок (в этом порядке)
+BODY_ARRAYS = (
+    "position", "velocity", "orientation", "matrices", "angular_velocity", "mass", "inertia", "inv_inertia",
+    "num_sides", "size", "radius", "vertices", "vertex_mask", "normals", "normal_mask", "edges", "edge_mask",
+    "is_rolling", "is_sleeping", "grounded_timer", "result", "island",
+)
+
+
+class DiceSimulation:
+    """
+    Детерминированная симуляция горсти кубиков без графики.
+
+    Все, что влияет на результат, - мир, генератор случайных чисел и номер шага -
+    хранится здесь и меняется только входами (apply) и шагами (step).
+    Одинаковые сид и входы на тех же шагах дают побитно одинаковые броски.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random()
+        self.reset(seed)
+
+    def reset(self, seed):
+        self.seed = seed
+        self.rng.seed(seed)
+        self.step_index = 0
+        self.world = DiceWorld(plane_y=-2)
+        self.num_sides = 6
+
+    def apply(self, command):
+        """
+        Применяет вход перед очередным шагом.
+
+        Команды: ("handful", num_sides, count) - новая горсть, ("roll",) - бросок лежащих кубиков.
+        """
+        if command[0] == "handful":
+            self.create_handful(command[1], command[2])
+        elif command[0] == "roll":
+            self.roll()
+        else:
+            raise ValueError(f"Неизвестная команда: {command[0]}")
+
+    def create_handful(self, num_sides, count):
+        """Новый мир с горстью кубиков, разложенных сеткой над полом."""
+        self.num_sides = num_sides
+        self.world = DiceWorld(plane_y=-2, capacity=count)
+        columns = math.ceil(math.sqrt(count))
+        spacing = DICE_SIZE * 2.5
+        for i in range(count):
+            row, column = divmod(i, columns)
+            self.world.add(num_sides, DICE_SIZE,
+                           ((column - (columns - 1) / 2) * spacing, 3, (row - (columns - 1) / 2) * spacing))
+
+    def roll(self):
+        bodies = self.world.bodies
+        for i in range(bodies.count):
+            if not bodies.is_rolling[i]:
+                initial_velocity = [self.rng.uniform(-5, 5), self.rng.uniform(8, 12), self.rng.uniform(-5, 5)]
+                initial_angular_velocity = [self.rng.uniform(-180, 180), self.rng.uniform(-180, 180),
+                                            self.rng.uniform(-180, 180)]
+                bodies.start_roll(i, initial_velocity, initial_angular_velocity)
+
+    def step(self):
+        events = self.world.step(PHYSICS_DT)
+        self.step_index += 1
+        return events
+
+    def poses(self):
+        """Позиции и кватернионы всех кубиков одним float32 массивом (N, 7)."""
+        bodies = self.world.bodies
+        return np.hstack([bodies.position[:bodies.count], bodies.orientation[:bodies.count]]).astype(np.float32)
+
+    def snapshot(self):
+        """
+        Полное состояние в байтах: длина заголовка, JSON-заголовок и сырые массивы BODY_ARRAYS.
+
+        В заголовке только числа (номер шага, размеры массивов, состояние генератора),
+        поэтому чтение чужой записи не выполняет кода, а одинаковое состояние дает одинаковые байты.
+        """
+        bodies = self.world.bodies
+        header = json.dumps({
+            "step": self.step_index,
+            "num_sides": self.num_sides,
+            "rng": self.rng.getstate(),
+            "plane_y": self.world.plane_y,
+            "next_island": self.world.next_island,
+            "count": bodies.count,
+            "sleep_version": bodies.sleep_version,
+            "shape": [bodies.capacity, bodies.max_vertices, bodies.max_faces, bodies.max_edges],
+        }).encode()
+        arrays = b"".join(getattr(bodies, name).tobytes() for name in BODY_ARRAYS)
+        return struct.pack("<I", len(header)) + header + arrays
+
+    def restore(self, data):
+        """
+        Восстанавливает состояние из snapshot().
+
+        Raises:
+            ValueError: размер данных не сходится с заголовком.
+        """
+        (header_length,) = struct.unpack_from("<I", data)
+        header = json.loads(data[4:4 + header_length])
+        capacity, max_vertices, max_faces, max_edges = (int(n) for n in header["shape"])
+
+        world = DiceWorld(plane_y=header["plane_y"])
+        bodies = world.bodies
+        bodies.allocate(capacity, max_vertices, max_faces, max_edges)
+        # Типы и формы массивов берутся из только что созданного мира, из файла - только байты
+        offset = 4 + header_length
+        for name in BODY_ARRAYS:
+            target = getattr(bodies, name)
+            if offset + target.nbytes > len(data):
+                raise ValueError("Снимок короче, чем указано в заголовке")
+            target[...] = np.frombuffer(data, dtype=target.dtype, count=target.size, offset=offset).reshape(target.shape)
+            offset += target.nbytes
+        if offset != len(data):
+            raise ValueError("Снимок длиннее, чем указано в заголовке")
+
+        bodies.count = int(header["count"])
+        bodies.sleep_version = int(header["sleep_version"])
+        world.next_island = int(header["next_island"])
+        self.world = world
+        self.step_index = int(header["step"])
+        self.num_sides = int(header["num_sides"])
+        version, state, gauss_next = header["rng"]
+        self.rng.setstate((version, tuple(state), gauss_next))
+
+
+class Recorder:
+    """
+    Пишет запись симуляции в компактный двоичный файл.
+
+    Файл - заголовок и последовательность записей: входы с номером шага, полные
+    снимки каждые SNAPSHOT_INTERVAL шагов и сжатые пачки поз кубиков за каждый шаг.
+    """
+
+    def __init__(self, path, seed):
+        self.file = open(path, "wb")
+        header = json.dumps({"seed": seed, "dt": PHYSICS_DT, "snapshot_interval": SNAPSHOT_INTERVAL}).encode()
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.states = []
+        self.states_start = 0
+
+    def write(self, kind, step, data):
+        self.file.write(RECORD_HEADER.pack(kind, step, len(data)))
+        self.file.write(data)
+
+    def record_input(self, simulation, command):
+        self.write(INPUT, simulation.step_index, json.dumps(command).encode())
+
+    def after_step(self, simulation):
+        """Позы после шага; каждые SNAPSHOT_INTERVAL шагов - полный снимок (до входов следующего шага)."""
+        poses = simulation.poses()
+        # Число кубиков меняется только вместе с горстью - тогда начинается новая пачка
+        if self.states and len(self.states[0]) != len(poses):
+            self.flush_states()
+        if not self.states:
+            self.states_start = simulation.step_index
+        self.states.append(poses)
+
+        if simulation.step_index % SNAPSHOT_INTERVAL == 0:
+            self.flush_states()
+            self.write(SNAPSHOT, simulation.step_index, zlib.compress(simulation.snapshot()))
+
+    def flush_states(self):
+        if self.states:
+            data = np.stack(self.states)
+            payload = struct.pack("<II", data.shape[0], data.shape[1]) + zlib.compress(data.tobytes())
+            self.write(STATES, self.states_start, payload)
+            self.states = []
+
+    def close(self):
+        self.flush_states()
+        self.file.close()
+
+
+class Replay:
+    """
+    Чтение записи: входы по шагам, снимки и позы для проверки.
+
+    seek() восстанавливает ближайший снимок не позже нужного шага и досчитывает
+    только оставшиеся шаги, поэтому переход к любому кадру стоит не больше
+    SNAPSHOT_INTERVAL шагов.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} - не запись бросков")
+
+        offset = len(MAGIC)
+        (header_length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        self.header = json.loads(data[offset:offset + header_length])
+        offset += header_length
+
+        self.inputs = {}
+        self.snapshots = {}
+        self.states = {}
+        while offset < len(data):
+            kind, step, length = RECORD_HEADER.unpack_from(data, offset)
+            offset += RECORD_HEADER.size
+            payload = data[offset:offset + length]
+            offset += length
+
+            if kind == INPUT:
+                self.inputs.setdefault(step, []).append(tuple(json.loads(payload)))
+            elif kind == SNAPSHOT:
+                self.snapshots[step] = payload
+            elif kind == STATES:
+                steps, count = struct.unpack_from("<II", payload)
+                poses = np.frombuffer(zlib.decompress(payload[8:]), dtype=np.float32).reshape(steps, count, 7)
+                for i in range(steps):
+                    self.states[step + i] = poses[i]
+
+        self.snapshot_steps = sorted(self.snapshots)
+        self.length = max(self.states) if self.states else 0
+
+    def simulation(self):
+        return DiceSimulation(self.header["seed"])
+
+    def apply_inputs(self, simulation):
+        for command in self.inputs.get(simulation.step_index, ()):
+            simulation.apply(command)
+
+    def step(self, simulation):
+        """Входы этого шага и сам шаг, как при записи."""
+        self.apply_inputs(simulation)
+        return simulation.step()
+
+    def seek(self, simulation, step):
+        """Переводит симуляцию в состояние после step шагов."""
+        earlier = [s for s in self.snapshot_steps if s <= step]
+        if earlier:
+            simulation.restore(zlib.decompress(self.snapshots[earlier[-1]]))
+        else:
+            simulation.reset(self.header["seed"])
+        while simulation.step_index < step:
+            self.step(simulation)
+
+    def matches(self, simulation):
+        """Совпадают ли позы после шага с записанными (побитно в float32)."""
+        recorded = self.states.get(simulation.step_index)
+        return recorded is None or np.array_equal(recorded, simulation.poses())
+
+    def verify(self, simulation):
+        """Номер первого шага, на котором повтор разошелся с записью, или None."""
+        simulation.reset(self.header["seed"])
+        while simulation.step_index < self.length:
+            self.step(simulation)
+            if not self.matches(simulation):
+                return simulation.step_index
+            snapshot = self.snapshots.get(simulation.step_index)
+            if snapshot is not None and zlib.decompress(snapshot) != simulation.snapshot():
+                return simulation.step_index
+        return None
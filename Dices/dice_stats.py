@@ -0,0 +1,159 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Только физика: ни OpenGL, ни pygame здесь не импортируются
+from dice_physics import DiceBodies
+# Размер кубика и шаг физики - те же, что у симуляции в dice_d20.py
+from dice_replay import DICE_SIZE, PHYSICS_DT
+
+# Параметры броска те же, что у SPACE в dice_d20.py
+START_POSITION = (0, 3, 0)
+MAX_ROLL_TIME = 30.0
+
+
+def roll_batch(num_sides, count, seed, size=DICE_SIZE, dt=PHYSICS_DT, max_time=MAX_ROLL_TIME):
+    """
+    Бросает count независимых кубиков одним пакетным шагом DiceBodies.
+
+    Кубики не сталкиваются друг с другом, поэтому каждый - отдельный бросок.
+
+    Returns:
+        counts: (num_sides,) сколько раз выпала каждая грань.
+        unsettled: сколько кубиков не остановилось за max_time.
+    """
+    rng = np.random.default_rng(seed)
+    bodies = DiceBodies(capacity=count)
+    for _ in range(count):
+        bodies.add(num_sides, size)
+
+    velocity = np.column_stack([
+        rng.uniform(-5, 5, count), rng.uniform(8, 12, count), rng.uniform(-5, 5, count)
+    ])
+    angular_velocity = rng.uniform(-180, 180, (count, 3))
+    bodies.position[:count] = START_POSITION
+    for i in range(count):
+        bodies.start_roll(i, velocity[i], angular_velocity[i])
+
+    for _ in range(int(max_time / dt)):
+        if len(bodies.step(dt).indices) == 0:
+            break
+
+    results = bodies.result[:count]
+    counts = np.bincount(results[results > 0] - 1, minlength=num_sides)
+    return counts, int(np.count_nonzero(results == 0))
+
+
+def regularized_gamma_q(a, x):
+    """Верхняя регуляризованная неполная гамма-функция Q(a, x) (ряд или цепная дробь)."""
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+
+    # Цепная дробь (метод Ленца)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def chi_square(counts):
+    """Критерий хи-квадрат для равномерного распределения граней: (статистика, p-значение)."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if total == 0:
+        return 0.0, 1.0
+    expected = total / len(counts)
+    statistic = float(np.sum((counts - expected) ** 2) / expected)
+    return statistic, regularized_gamma_q((len(counts) - 1) / 2, statistic / 2)
+
+
+def run(num_sides, rolls, seed=0, workers=None, batch=1000):
+    """
+    Бросает rolls кубиков пачками по batch в пуле процессов.
+
+    Сид каждой пачки порождается из seed через SeedSequence.spawn, поэтому итоговая
+    гистограмма не зависит от числа процессов и порядка их завершения.
+
+    Yields:
+        Словарь с накопленной гистограммой и статистикой после каждой завершенной пачки.
+    """
+    sizes = [batch] * (rolls // batch) + ([rolls % batch] if rolls % batch else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    counts = np.zeros(num_sides, dtype=np.int64)
+    unsettled = 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(roll_batch, num_sides, size, child): size
+            for size, child in zip(sizes, seeds)
+        }
+        for future in as_completed(futures):
+            batch_counts, batch_unsettled = future.result()
+            counts += batch_counts
+            unsettled += batch_unsettled
+            done += futures[future]
+
+            statistic, p_value = chi_square(counts)
+            yield {
+                "sides": num_sides,
+                "rolls": done,
+                "counts": counts.tolist(),
+                "unsettled": unsettled,
+                "chi2": statistic,
+                "dof": num_sides - 1,
+                "p_value": p_value,
+            }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Проверка честности кубиков методом Монте-Карло без графики.')
+    parser.add_argument('--sides', type=int, choices=(4, 6), default=6, help='Тип кубика.')
+    parser.add_argument('--rolls', type=int, default=100000, help='Общее число бросков.')
+    parser.add_argument('--batch', type=int, default=1000, help='Бросков в одной задаче пула.')
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - все ядра).')
+    parser.add_argument('--seed', type=int, default=0, help='Начальный сид.')
+    parser.add_argument('--output', type=str, default='dice_stats.jsonl',
+                        help='Файл JSON Lines, куда после каждой пачки дописывается накопленная статистика.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.output, 'a') as f:
+        for progress in run(args.sides, args.rolls, args.seed, args.workers, args.batch):
+            f.write(json.dumps(progress) + '\n')
+            f.flush()
+            print(f"{progress['rolls']}/{args.rolls}: {progress['counts']}, "
+                  f"chi2 = {progress['chi2']:.2f}, p = {progress['p_value']:.4f}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"{args.rolls} бросков за {elapsed:.1f} с ({args.rolls / elapsed:.0f} бросков/с), "
+          f"результаты в {os.path.abspath(args.output)}", file=sys.stderr)
@@ -1,248 +1,409 @@
-﻿import sys
+﻿import argparse
+import ctypes
+import os
+import sys
 import numpy as np
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QComboBox, QToolButton, QHBoxLayout
 from PyQt5.QtOpenGL import QGLWidget
 from OpenGL.GL import *
+from OpenGL.GL.shaders import compileProgram, compileShader
 from OpenGL.GLU import *
 import random
 
+# Общие для визуализаторов модули лежат в корне репозитория
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from frame_profiler import FrameProfiler
+from glyph_atlas import GlyphAtlas, TextBatch
 
-class Dice3DWidget(QGLWidget):
-    def __init__(self, parent=None):
-        super(Dice3DWidget, self).__init__(parent)
-        self.dice_type = 'D6'
-        self.dice_count = 1
-        self.dice_positions = []
-        self.reset_dice_positions()
 
-        self.angle_x, self.angle_y = 25, 30
-        self.light_position = [1.0, 4.0, 1.0, 1.0]
+PALETTE = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0),
+           (1, 0, 1), (0, 1, 1), (0.5, 0.5, 0.5), (1, 0.5, 0)]
 
-    def reset_dice_positions(self):
-        self.dice_positions = [(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1)) for _ in range(self.dice_count)]
-        self.update()
-
-    def initializeGL(self):
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_LIGHTING)
-        glEnable(GL_LIGHT0)
-
-        glLightfv(GL_LIGHT0, GL_POSITION, self.light_position)
-        glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
-        glLightfv(GL_LIGHT0, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
+PHI = (1 + np.sqrt(5)) / 2
 
-        glMaterialfv(GL_FRONT, GL_SPECULAR, [0.5, 0.5, 0.5, 1.0])
-        glMaterialf(GL_FRONT, GL_SHININESS, 50)
-
-    def resizeGL(self, w, h):
-        glViewport(0, 0, w, h)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(45.0, w / h, 0.1, 100.0)
-        glMatrixMode(GL_MODELVIEW)
-
-    def paintGL(self):
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
-        glTranslatef(0.0, 0.0, -5.0)
-
-        glRotatef(self.angle_x, 1.0, 0.0, 0.0)
-        glRotatef(self.angle_y, 0.0, 1.0, 0.0)
-
-        for position in self.dice_positions:
-            self.draw_dice(position)
-
-        glFlush()
-
-    def draw_dice(self, position):
-        glPushMatrix()
-        glTranslatef(*position)
-        
-        if self.dice_type == 'D4':
-            self.draw_d4()
-        elif self.dice_type == 'D6':
-            self.draw_d6()
-        elif self.dice_type == 'D8':
-            self.draw_d8()
-        elif self.dice_type == 'D10':
-            self.draw_d10()
-        elif self.dice_type == 'D12':
-            self.draw_d12()
-        elif self.dice_type == 'D20':
-            self.draw_d20()
-        elif self.dice_type == 'D100':
-            self.draw_d10()
-
-        glPopMatrix()
-
-    def draw_d4(self):
-        glBegin(GL_TRIANGLES)
-        vertices = [
+DICE_GEOMETRY = {
+    'D4': {
+        'vertices': [
             [1, 1, 1],
             [1, -1, -1],
             [-1, 1, -1],
             [-1, -1, 1]
-        ]
-        indices = [(0, 1, 2), (1, 2, 3), (0, 1, 3), (0, 2, 3)]
-        for i, color in enumerate([(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0)]):
-            glColor3f(*color)
-            for vertex in indices[i]:
-                glVertex3fv(vertices[vertex])
-        glEnd()
-
-    def draw_d6(self):
-        glBegin(GL_QUADS)
-        vertices = [
+        ],
+        'faces': [(0, 1, 2), (1, 2, 3), (0, 1, 3), (0, 2, 3)],
+        'colors': [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0)],
+        'numbered': False,
+    },
+    'D6': {
+        'vertices': [
             [-1, -1, -1], [1, -1, -1], [1, 1, -1], [-1, 1, -1],
             [-1, -1, 1], [1, -1, 1], [1, 1, 1], [-1, 1, 1]
-        ]
-        faces = [
+        ],
+        'faces': [
             (0, 1, 2, 3),
             (4, 5, 6, 7),
             (0, 3, 7, 4),
             (1, 5, 6, 2),
             (3, 2, 6, 7),
             (0, 1, 5, 4)
-        ]
-
-        colors = [
+        ],
+        'colors': [
             (1, 0, 0), (0, 1, 0), (0, 0, 1),
             (1, 1, 0), (1, 0, 1), (0, 1, 1)
-        ]
-
-        for i, face in enumerate(faces):
-            glColor3f(*colors[i % len(colors)])
-            for vertex in face:
-                glVertex3fv(vertices[vertex])
-    
-        glEnd()
-
-    def draw_d8(self):
-        vertices = [
+        ],
+        'numbered': False,
+    },
+    'D8': {
+        'vertices': [
             [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]
-        ]
-        faces = [
+        ],
+        'faces': [
             (0, 2, 4), (0, 4, 3), (0, 3, 1), (0, 1, 2),
             (1, 3, 5), (1, 5, 2), (2, 5, 4), (3, 4, 5)
-        ]
-        colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), 
-                  (1, 0, 1), (0, 1, 1), (0.5, 0.5, 0.5), (1, 0.5, 0)]
-    
-        for i, face in enumerate(faces):
-            glColor3f(*colors[i % len(colors)])
-            glBegin(GL_TRIANGLES)
-            for vertex in face:
-                glVertex3fv(vertices[vertex])
-            glEnd()
-
-        glColor3f(1, 1, 1)
-        for idx, vertex in enumerate(vertices):
-            glPushMatrix()
-            glTranslatef(*vertex)
-            self.render_text(str(idx + 1))
-            glPopMatrix()
-
-    def draw_d10(self):
-        vertices = [
+        ],
+        'colors': PALETTE,
+    },
+    'D10': {
+        'vertices': [
             [0, 0, 1], [0.5, 0, 0.5], [1, 0, 0], [0.5, 0, -0.5],
             [0, 0, -1], [-0.5, 0, -0.5], [-1, 0, 0], [-0.5, 0, 0.5],
             [0, 0, 1], [0, 0, -1]
-        ]
-        faces = [
-            (0, 1, 2), (0, 2, 3), (0, 3, 4), (0, 4, 5), 
+        ],
+        'faces': [
+            (0, 1, 2), (0, 2, 3), (0, 3, 4), (0, 4, 5),
             (0, 5, 6), (0, 6, 7), (0, 7, 1), (2, 1, 8),
-            (3, 2, 8), (4, 3, 8), (5, 4, 8), (6, 5, 8), 
+            (3, 2, 8), (4, 3, 8), (5, 4, 8), (6, 5, 8),
             (7, 6, 8)
-        ]
-        colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), 
-                  (1, 0, 1), (0, 1, 1), (0.5, 0.5, 0.5), (1, 0.5, 0)]
-    
-        for i, face in enumerate(faces):
-            glColor3f(*colors[i % len(colors)])
-            glBegin(GL_TRIANGLES)
-            for vertex in face:
-                glVertex3fv(vertices[vertex])
-            glEnd()
-
-        glColor3f(1, 1, 1)
-        for idx, vertex in enumerate(vertices):
-            glPushMatrix()
-            glTranslatef(*vertex)
-            self.render_text(str((idx % 10) + 1))
-            glPopMatrix()
-
-        glColor3f(1, 1, 1)
-        for idx, vertex in enumerate(vertices):
-            glPushMatrix()
-            glTranslatef(*vertex)
-            self.render_text(str((idx % 10) + 1))
-            glPopMatrix()
-
-    def draw_d12(self):
-        phi = (1 + np.sqrt(5)) / 2
-        vertices = [
+        ],
+        'colors': PALETTE,
+    },
+    'D12': {
+        'vertices': [
             [1, 1, 1], [1, 1, -1], [1, -1, 1], [1, -1, -1],
             [-1, 1, 1], [-1, 1, -1], [-1, -1, 1], [-1, -1, -1],
-            [0, 1 / phi, phi], [0, 1 / phi, -phi], 
-            [0, -1 / phi, phi], [0, -1 / phi, -phi],
-            [phi, 0, 1 / phi], [-phi, 0, 1 / phi], 
-            [phi, 0, -1 / phi], [-phi, 0, -1 / phi]
-        ]
-        faces = [
+            [0, 1 / PHI, PHI], [0, 1 / PHI, -PHI],
+            [0, -1 / PHI, PHI], [0, -1 / PHI, -PHI],
+            [PHI, 0, 1 / PHI], [-PHI, 0, 1 / PHI],
+            [PHI, 0, -1 / PHI], [-PHI, 0, -1 / PHI]
+        ],
+        'faces': [
             (0, 8, 4, 12, 10), (0, 10, 2, 14, 8),
             (0, 12, 6, 2, 10), (1, 11, 9, 5, 13),
             (1, 13, 3, 15, 11), (1, 5, 7, 3, 13),
             (3, 7, 9, 11, 15), (2, 10, 0, 8, 14),
             (2, 14, 12, 4, 8), (5, 7, 3, 9, 11),
             (4, 6, 2, 0, 10), (6, 12, 8, 14, 2)
-        ]
-        colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), 
-                  (1, 0, 1), (0, 1, 1), (0.5, 0.5, 0.5), (1, 0.5, 0)]
-    
-        for i, face in enumerate(faces):
-            glColor3f(*colors[i % len(colors)])
-            glBegin(GL_POLYGON)
-            for vertex in face:
-                glVertex3fv(vertices[vertex])
-            glEnd()
-
-        glColor3f(1, 1, 1)
-        for idx, vertex in enumerate(vertices):
-            glPushMatrix()
-            glTranslatef(*vertex)
-            self.render_text(str(idx + 1))
-            glPopMatrix()
-
-
-    def draw_d20(self):
-        t = (1.0 + np.sqrt(5.0)) / 2.0
-        vertices = [
-            [-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
-            [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
-            [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]
-        ]
-        faces = [
+        ],
+        'colors': PALETTE,
+    },
+    'D20': {
+        'vertices': [
+            [-1, PHI, 0], [1, PHI, 0], [-1, -PHI, 0], [1, -PHI, 0],
+            [0, -1, PHI], [0, 1, PHI], [0, -1, -PHI], [0, 1, -PHI],
+            [PHI, 0, -1], [PHI, 0, 1], [-PHI, 0, -1], [-PHI, 0, 1]
+        ],
+        'faces': [
             (0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11),
             (1, 5, 9), (5, 11, 4), (11, 10, 2), (10, 7, 6), (7, 1, 8),
             (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
             (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)
-        ]
-        colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), 
-                  (1, 0, 1), (0, 1, 1), (0.5, 0.5, 0.5), (1, 0.5, 0)]
-    
-        for i, face in enumerate(faces):
-            glColor3f(*colors[i % len(colors)])
-            glBegin(GL_TRIANGLES)
-            for vertex in face:
-                glVertex3fv(vertices[vertex])
-            glEnd()
-
-        glColor3f(1, 1, 1)
-        for idx, vertex in enumerate(vertices):
-            glPushMatrix()
-            glTranslatef(*vertex)
-            self.render_text(str(idx + 1))
-            glPopMatrix()
+        ],
+        'colors': PALETTE,
+    },
+}
+
+# D100 рисуется той же геометрией, что и D10
+DICE_SHAPE_ALIASES = {'D100': 'D10'}
+
+# Высота цифр на вершинах
+LABEL_SIZE = 0.15
+
+
+def vertex_labels(shape):
+    """Подписи у вершин кубика: список (позиция, текст). У D10 номера идут по кругу из 10."""
+    geometry = DICE_GEOMETRY[shape]
+    if not geometry.get('numbered', True):
+        return []
+    count = 10 if shape == 'D10' else len(geometry['vertices'])
+    return [(vertex, str(idx % count + 1)) for idx, vertex in enumerate(geometry['vertices'])]
+
+
+def build_dice_mesh(shape):
+    """
+    Строит треугольный меш кубика с плоскими нормалями и цветом на грань.
+
+    Returns:
+        vertex_data: float32 массив (V, 9) - позиция, нормаль, цвет.
+        indices: uint32 массив индексов треугольников.
+    """
+    geometry = DICE_GEOMETRY[shape]
+    vertices = np.array(geometry['vertices'], dtype=np.float32)
+    colors = geometry['colors']
+
+    vertex_data = []
+    indices = []
+    for i, face in enumerate(geometry['faces']):
+        points = vertices[list(face)]
+        normal = np.cross(points[1] - points[0], points[2] - points[0])
+        length = np.linalg.norm(normal)
+        if length > 0:
+            normal /= length
+        # Нормаль наружу: кубик выпуклый и центрирован в начале координат
+        if np.dot(normal, points.mean(axis=0)) < 0:
+            normal = -normal
+
+        color = colors[i % len(colors)]
+        base = len(vertex_data)
+        for point in points:
+            vertex_data.append([*point, *normal, *color])
+        # Веер треугольников для многоугольной грани
+        for k in range(1, len(face) - 1):
+            indices.extend([base, base + k, base + k + 1])
+
+    return np.array(vertex_data, dtype=np.float32), np.array(indices, dtype=np.uint32)
+
+
+class DiceMesh:
+    """Меш кубика в VBO + индексном буфере. Создается при текущем GL контексте."""
+
+    STRIDE = 9 * 4
+
+    def __init__(self, vertex_data, indices):
+        self.index_count = len(indices)
+
+        self.vertex_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_STATIC_DRAW)
+
+        self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def bind(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, self.STRIDE, ctypes.c_void_p(12))
+        glColorPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(24))
+
+    def draw(self):
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+
+    def unbind(self):
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+# Шейдер для инстансинга: меш берется из fixed-function массивов (gl_Vertex, gl_Normal, gl_Color),
+# смещение, масштаб и оттенок - из буфера экземпляров
+INSTANCED_VERTEX_SHADER = """
+#version 120
+attribute vec4 instance_offset;
+attribute vec3 instance_tint;
+
+void main() {
+    vec4 position = vec4(gl_Vertex.xyz * instance_offset.w + instance_offset.xyz, 1.0);
+    vec3 normal = normalize(gl_NormalMatrix * gl_Normal);
+    vec4 eye = gl_ModelViewMatrix * position;
+    vec3 light = normalize(gl_LightSource[0].position.xyz - eye.xyz);
+    float diffuse = max(dot(normal, light), 0.0);
+    gl_FrontColor = vec4(gl_Color.rgb * instance_tint * (0.2 + 0.8 * diffuse), 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * position;
+}
+"""
+
+INSTANCED_FRAGMENT_SHADER = """
+#version 120
+void main() {
+    gl_FragColor = gl_Color;
+}
+"""
+
+
+class DiceInstances:
+    """
+    Буфер экземпляров кубиков: на каждый кубик смещение xyz, масштаб и оттенок rgb.
+    Все кубики одного типа рисуются одним glDrawElementsInstanced.
+    """
+
+    FLOATS = 7
+
+    def __init__(self):
+        self.shader = compileProgram(
+            compileShader(INSTANCED_VERTEX_SHADER, GL_VERTEX_SHADER),
+            compileShader(INSTANCED_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+        )
+        self.offset_location = glGetAttribLocation(self.shader, "instance_offset")
+        self.tint_location = glGetAttribLocation(self.shader, "instance_tint")
+        self.buffer = glGenBuffers(1)
+        self.count = 0
+
+    @staticmethod
+    def supported():
+        return bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)
+
+    def upload(self, instance_data):
+        self.count = len(instance_data)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, instance_data.nbytes, instance_data, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, mesh):
+        stride = self.FLOATS * 4
+        glUseProgram(self.shader)
+        mesh.bind()
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glEnableVertexAttribArray(self.offset_location)
+        glVertexAttribPointer(self.offset_location, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+        glVertexAttribDivisor(self.offset_location, 1)
+        glEnableVertexAttribArray(self.tint_location)
+        glVertexAttribPointer(self.tint_location, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(16))
+        glVertexAttribDivisor(self.tint_location, 1)
+
+        glDrawElementsInstanced(GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0), self.count)
+
+        glVertexAttribDivisor(self.offset_location, 0)
+        glVertexAttribDivisor(self.tint_location, 0)
+        glDisableVertexAttribArray(self.offset_location)
+        glDisableVertexAttribArray(self.tint_location)
+        mesh.unbind()
+        glUseProgram(0)
+
+
+class Dice3DWidget(QGLWidget):
+    def __init__(self, parent=None):
+        super(Dice3DWidget, self).__init__(parent)
+        self.dice_type = 'D6'
+        self.dice_count = 1
+        self.dice_positions = []
+        self.reset_dice_positions()
+
+        self.angle_x, self.angle_y = 25, 30
+        self.light_position = [1.0, 4.0, 1.0, 1.0]
+
+        self.profiler = FrameProfiler()
+        self.setFocusPolicy(Qt.StrongFocus)
+
+        # Меши кубиков в видеопамяти, по одному на тип
+        self.meshes = {}
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_F3:
+            self.profiler.toggle_overlay()
+            self.update()
+        else:
+            super(Dice3DWidget, self).keyPressEvent(event)
+
+    def reset_dice_positions(self):
+        self.dice_positions = [(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1)) for _ in range(self.dice_count)]
+
+        # Данные экземпляров: смещение, масштаб, оттенок
+        self.instance_data = np.ones((self.dice_count, DiceInstances.FLOATS), dtype=np.float32)
+        self.instance_data[:, :3] = self.dice_positions
+        self.instances_dirty = True
+        self.labels_shape = None
+        self.update()
+
+    def initializeGL(self):
+        # initializeGL вызывается и при пересоздании контекста - старые буферы уже недействительны
+        self.meshes = {}
+        self.instances = None
+        self.instances_dirty = True
+        self.text_batch = TextBatch(GlyphAtlas())
+        self.labels_shape = None
+        if DiceInstances.supported():
+            try:
+                self.instances = DiceInstances()
+            except RuntimeError as e:
+                print(f"Instanced rendering disabled: {e}")
+
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        glEnable(GL_COLOR_MATERIAL)
+        glColorMaterial(GL_FRONT, GL_AMBIENT_AND_DIFFUSE)
+
+        glLightfv(GL_LIGHT0, GL_POSITION, self.light_position)
+        glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
+        glLightfv(GL_LIGHT0, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
+
+        glMaterialfv(GL_FRONT, GL_SPECULAR, [0.5, 0.5, 0.5, 1.0])
+        glMaterialf(GL_FRONT, GL_SHININESS, 50)
+
+    def resizeGL(self, w, h):
+        glViewport(0, 0, w, h)
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(45.0, w / h, 0.1, 100.0)
+        glMatrixMode(GL_MODELVIEW)
+
+    def paintGL(self):
+        self.profiler.mark_frame()
+        with self.profiler.stage("paintGL"):
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()
+            glTranslatef(0.0, 0.0, -5.0)
+
+            glRotatef(self.angle_x, 1.0, 0.0, 0.0)
+            glRotatef(self.angle_y, 0.0, 1.0, 0.0)
+
+            with self.profiler.stage("dice"):
+                self.draw_dice_batch(self.dice_positions)
+
+            glFlush()
+
+        self.profiler.draw_overlay(self)
+
+    def get_mesh(self, dice_type):
+        """Возвращает меш кубика, создавая и загружая его при первом обращении."""
+        shape = DICE_SHAPE_ALIASES.get(dice_type, dice_type)
+        if shape not in self.meshes:
+            self.meshes[shape] = DiceMesh(*build_dice_mesh(shape))
+        return self.meshes[shape]
+
+    def draw_dice_batch(self, positions):
+        mesh = self.get_mesh(self.dice_type)
+        if self.instances is not None:
+            if self.instances_dirty:
+                self.instances.upload(self.instance_data)
+                self.instances_dirty = False
+            self.instances.draw(mesh)
+        else:
+            mesh.bind()
+            for position in positions:
+                glPushMatrix()
+                glTranslatef(*position)
+                mesh.draw()
+                glPopMatrix()
+            mesh.unbind()
+
+        self.draw_labels(positions)
+
+    def draw_labels(self, positions):
+        """Все подписи сцены рисуются одним буфером квадов, повернутых к камере."""
+        shape = DICE_SHAPE_ALIASES.get(self.dice_type, self.dice_type)
+        if self.labels_shape != shape:
+            self.text_batch.clear()
+            for vertex, text in vertex_labels(shape):
+                # Чуть наружу от вершины, чтобы подпись не пряталась в гранях
+                offset = np.array(vertex, dtype=np.float32) * 1.1
+                for position in positions:
+                    self.text_batch.add(offset + position, text, LABEL_SIZE)
+            self.labels_shape = shape
+
+        # Оси камеры в мировых координатах - первые строки поворота modelview
+        modelview = glGetFloatv(GL_MODELVIEW_MATRIX)
+        self.text_batch.draw(right=modelview[:3, 0], up=modelview[:3, 1], color=(1, 1, 1))
 
 
 class MainWindow(QMainWindow):
@@ -306,7 +467,16 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='3D кубики.')
+    parser.add_argument('--profile', type=str, help='Сохранить статистику кадров при выходе (.json или .csv).')
+    parser.add_argument('--dice', type=int, default=1, help='Начальное количество кубиков.')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = MainWindow()
+    window.dice_widget.dice_count = max(args.dice, 1)
+    window.dice_widget.reset_dice_positions()
+    if args.profile:
+        app.aboutToQuit.connect(lambda: window.dice_widget.profiler.dump(args.profile))
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
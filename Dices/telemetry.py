@@ -0,0 +1,237 @@
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Уровни подробности
+OFF = 0
+RESULTS = 1   # результаты бросков и сообщения
+CONTACTS = 2  # + каждый удар: энергия и скорости кубика
+STEPS = 3     # + суммарная энергия мира на каждом шаге
+LEVEL_NAMES = ("off", "results", "contacts", "steps")
+
+MAGIC = b"DICETLM1"
+MESSAGE_LENGTH = 96
+
+CHANNELS = {
+    "log": (RESULTS, np.dtype([("step", "<i8"), ("text", f"S{MESSAGE_LENGTH}")])),
+    "result": (RESULTS, np.dtype([("step", "<i8"), ("die", "<i4"), ("face", "<i4")])),
+    "contact": (CONTACTS, np.dtype([
+        ("step", "<i8"), ("die", "<i4"), ("energy", "<f4"),
+        ("velocity", "<f4", (3,)), ("angular_velocity", "<f4", (3,)),
+    ])),
+    "energy": (STEPS, np.dtype([("step", "<i8"), ("active", "<i4"), ("energy", "<f4")])),
+}
+
+
+class TelemetryChannel:
+    """
+    Кольцо заранее выделенных буферов одного канала.
+
+    Заполненный буфер отдается потоку записи, а запись продолжается в свободный.
+    Если поток записи не успевает и свободных буферов нет, новые строки
+    отбрасываются и считаются в dropped - физика не ждет диска.
+    """
+
+    def __init__(self, name, dtype, capacity, buffers):
+        self.name = name
+        self.dtype = dtype
+        self.free = queue.Queue()
+        for _ in range(buffers - 1):
+            self.free.put(np.zeros(capacity, dtype=dtype))
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.count = 0
+        self.dropped = 0
+
+    def append(self, sink, columns, rows):
+        start = 0
+        while start < rows:
+            if self.buffer is None and not self.take_buffer():
+                self.dropped += rows - start
+                return
+            n = min(rows - start, len(self.buffer) - self.count)
+            target = self.buffer[self.count:self.count + n]
+            for key, value in columns.items():
+                target[key] = value if np.ndim(value) == 0 else value[start:start + n]
+            self.count += n
+            start += n
+            if self.count == len(self.buffer):
+                sink.submit(self)
+
+    def take_buffer(self):
+        try:
+            self.buffer = self.free.get_nowait()
+        except queue.Empty:
+            return False
+        self.count = 0
+        return True
+
+
+class TelemetrySink:
+    """
+    Телеметрия физики кубиков с низкими накладными расходами.
+
+    Замеры пишутся векторно в кольцевые буферы numpy; заполненные буферы
+    пачками сбрасываются фоновым потоком в колоночный двоичный файл
+    (все значения одной колонки блока подряд). Тот же поток печатает сообщения,
+    поэтому консоль не тормозит цикл физики. Без path замеры только считаются.
+
+    Пример:
+        telemetry = TelemetrySink("roll.tlm", level=CONTACTS)
+        telemetry.record("contact", step=step, die=indices, energy=energy, ...)
+        telemetry.close()
+    """
+
+    def __init__(self, path=None, level=RESULTS, capacity=4096, buffers=4, flush_interval=0.5, echo=True):
+        self.level = level
+        self.echo = echo
+        self.flush_interval = flush_interval
+        self.last_flush = time.perf_counter()
+        self.channels = {
+            name: TelemetryChannel(name, dtype, capacity, buffers)
+            for name, (_, dtype) in CHANNELS.items()
+        }
+        self.file = open(path, "wb") if path else None
+        if self.file is not None:
+            self.file.write(MAGIC)
+
+        self.blocks = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def enabled(self, channel):
+        return self.level >= CHANNELS[channel][0]
+
+    def set_level(self, level):
+        self.level = level % len(LEVEL_NAMES)
+        self.log(f"Telemetry: {LEVEL_NAMES[self.level]}")
+
+    def record(self, channel, rows=None, **columns):
+        """
+        Добавляет строки в канал. Значения колонок - массивы одной длины или скаляры.
+        Ничего не делает, если канал ниже текущего уровня.
+        """
+        if not self.enabled(channel):
+            return
+        if rows is None:
+            rows = max((len(value) for value in columns.values() if np.ndim(value) > 0), default=1)
+        if rows:
+            self.channels[channel].append(self, columns, rows)
+
+    def log(self, message, step=-1):
+        """Сообщение для консоли; печатается фоновым потоком и сохраняется в канал log."""
+        if self.level >= RESULTS:
+            # Обрезка по границе символа: кириллица занимает 2 байта, половина символа не декодируется
+            text = message.encode("utf-8")[:MESSAGE_LENGTH].decode("utf-8", "ignore").encode("utf-8")
+            self.record("log", rows=1, step=step, text=text)
+            if self.echo:
+                self.blocks.put(message)
+
+    def tick(self):
+        """Вызывается раз в кадр: отдает на запись даже неполные буферы раз в flush_interval."""
+        now = time.perf_counter()
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+            self.last_flush = now
+
+    def flush(self):
+        for channel in self.channels.values():
+            if channel.buffer is not None and channel.count:
+                self.submit(channel)
+
+    def submit(self, channel):
+        self.blocks.put((channel, channel.buffer, channel.count))
+        channel.buffer = None
+        channel.count = 0
+        channel.take_buffer()
+
+    def close(self):
+        self.flush()
+        self.blocks.put(None)
+        self.thread.join()
+        if self.file is not None:
+            self.file.close()
+        dropped = {name: channel.dropped for name, channel in self.channels.items() if channel.dropped}
+        if dropped:
+            print(f"Telemetry dropped rows: {dropped}", file=sys.stderr)
+
+    def run(self):
+        while True:
+            item = self.blocks.get()
+            if item is None:
+                break
+            if isinstance(item, str):
+                print(item)
+                continue
+
+            channel, buffer, count = item
+            if self.file is not None:
+                write_block(self.file, channel.name, buffer[:count])
+            channel.free.put(buffer)
+
+
+def write_block(f, name, rows):
+    """Блок: имя канала, число строк и колонки подряд - имя, dtype и сырые данные каждой."""
+    name = name.encode()
+    f.write(struct.pack("<HII", len(name), len(rows), len(rows.dtype.names)) + name)
+    for column in rows.dtype.names:
+        data = np.ascontiguousarray(rows[column])
+        header = f"{column}:{data.dtype.str}:{','.join(map(str, data.shape[1:]))}".encode()
+        f.write(struct.pack("<HQ", len(header), data.nbytes) + header)
+        f.write(data.tobytes())
+
+
+def read_telemetry(path):
+    """Читает файл телеметрии: словарь канал -> словарь колонка -> массив со всеми строками."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} - не файл телеметрии")
+
+    parts = {}
+    offset = len(MAGIC)
+    while offset < len(data):
+        name_length, rows, column_count = struct.unpack_from("<HII", data, offset)
+        offset += struct.calcsize("<HII")
+        name = data[offset:offset + name_length].decode()
+        offset += name_length
+
+        block = {}
+        for _ in range(column_count):
+            header_length, nbytes = struct.unpack_from("<HQ", data, offset)
+            offset += struct.calcsize("<HQ")
+            column, dtype, shape = data[offset:offset + header_length].decode().split(":")
+            offset += header_length
+            shape = tuple(int(s) for s in shape.split(",") if s)
+            block[column] = np.frombuffer(data, dtype=dtype, count=rows * int(np.prod(shape, dtype=int)),
+                                          offset=offset).reshape((rows,) + shape)
+            offset += nbytes
+        parts.setdefault(name, []).append(block)
+
+    return {
+        name: {column: np.concatenate([block[column] for block in blocks]) for column in blocks[0]}
+        for name, blocks in parts.items()
+    }
+
+
+def record_step(sink, bodies, events, step=-1):
+    """Записывает события шага физики (StepEvents) пачкой: удары, результаты и энергию."""
+    if sink.enabled("contact"):
+        hits = events.indices[events.bounce]
+        if len(hits):
+            sink.record("contact", step=step, die=hits, energy=bodies.kinetic_energy(hits),
+                        velocity=bodies.velocity[hits], angular_velocity=bodies.angular_velocity[hits])
+
+    if sink.enabled("result"):
+        done = events.indices[events.settled]
+        if len(done):
+            sink.record("result", step=step, die=done, face=bodies.result[done])
+            for die, face in zip(done.tolist(), bodies.result[done].tolist()):
+                sink.log(f"Result: {face}" if bodies.count == 1 else f"Die {die} result: {face}", step)
+
+    if sink.enabled("energy"):
+        sink.record("energy", rows=1, step=step, active=len(events.indices),
+                    energy=bodies.kinetic_energy(events.indices).sum())
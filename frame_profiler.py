@@ -0,0 +1,134 @@
+import contextlib
+import csv
+import json
+import time
+import numpy as np
+
+
+class FrameProfiler:
+    """
+    Замеры времени кадра и отдельных этапов отрисовки для Qt/OpenGL виджетов.
+
+    Каждый этап хранит последние `history` замеров (в миллисекундах) в кольцевом буфере.
+    Замеряется время CPU: вызовы OpenGL только ставятся в очередь драйвера.
+
+    Пример:
+        with self.profiler.stage("paintGL"):
+            ...
+        self.profiler.mark_frame()
+    """
+
+    FRAME = "frame"
+
+    def __init__(self, history=600):
+        self.history = history
+        self.samples = {}
+        self.counts = {}
+        self.last_frame = None
+        self.overlay_visible = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_frame(self):
+        """Записывает интервал между соседними кадрами."""
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.record(self.FRAME, now - self.last_frame)
+        self.last_frame = now
+
+    def record(self, name, seconds):
+        if name not in self.samples:
+            self.samples[name] = np.zeros(self.history)
+            self.counts[name] = 0
+        self.samples[name][self.counts[name] % self.history] = seconds * 1000.0
+        self.counts[name] += 1
+
+    def values(self, name):
+        return self.samples[name][:min(self.counts[name], self.history)]
+
+    def statistics(self, name):
+        values = self.values(name)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "count": self.counts[name],
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(values.max()),
+        }
+
+    def summary(self):
+        return {name: self.statistics(name) for name in self.samples}
+
+    def dump(self, path):
+        """Сохраняет статистику в JSON (со всей историей) или CSV (только статистика)."""
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean", "p50", "p95", "p99", "max"])
+                for name, stats in summary.items():
+                    writer.writerow([name] + [stats[key] for key in ("count", "mean", "p50", "p95", "p99", "max")])
+        else:
+            data = {
+                "unit": "ms",
+                "summary": summary,
+                "history": {name: self.values(name).tolist() for name in self.samples},
+            }
+            with open(path, "w") as f:
+                json.dump(data, f, indent=2)
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+
+    def overlay_lines(self):
+        lines = []
+        for name in self.samples:
+            stats = self.statistics(name)
+            lines.append(f"{name:<12} p50 {stats['p50']:6.2f}  p95 {stats['p95']:6.2f}  p99 {stats['p99']:6.2f} ms")
+        return lines
+
+    def draw_overlay(self, widget):
+        """
+        Рисует статистику поверх кадра через QPainter.
+        Вызывается в конце paintGL; состояние OpenGL сохраняется и восстанавливается.
+        """
+        if not self.overlay_visible or not self.samples:
+            return
+
+        from PyQt5 import QtCore, QtGui
+        from OpenGL.GL import (
+            glPushAttrib, glPopAttrib, glMatrixMode, glPushMatrix, glPopMatrix,
+            GL_ALL_ATTRIB_BITS, GL_PROJECTION, GL_MODELVIEW,
+        )
+
+        glPushAttrib(GL_ALL_ATTRIB_BITS)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+
+        painter = QtGui.QPainter(widget)
+        painter.setFont(QtGui.QFont("Monospace", 9))
+        lines = self.overlay_lines()
+        metrics = painter.fontMetrics()
+        height = metrics.height() * len(lines) + 8
+        width = max(metrics.horizontalAdvance(line) for line in lines) + 12
+        painter.fillRect(QtCore.QRect(4, 4, width, height), QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtGui.QColor(255, 255, 255))
+        for i, line in enumerate(lines):
+            painter.drawText(10, 8 + metrics.ascent() + i * metrics.height(), line)
+        painter.end()
+
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopMatrix()
+        glPopAttrib()
@@ -0,0 +1,174 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+
+# Цифры 5x7, строки сверху вниз
+DIGIT_BITMAPS = {
+    '0': ["01110", "10001", "10011", "10101", "11001", "10001", "01110"],
+    '1': ["00100", "01100", "00100", "00100", "00100", "00100", "01110"],
+    '2': ["01110", "10001", "00001", "00010", "00100", "01000", "11111"],
+    '3': ["11110", "00001", "00001", "01110", "00001", "00001", "11110"],
+    '4': ["00010", "00110", "01010", "10010", "11111", "00010", "00010"],
+    '5': ["11111", "10000", "11110", "00001", "00001", "10001", "01110"],
+    '6': ["00110", "01000", "10000", "11110", "10001", "10001", "01110"],
+    '7': ["11111", "00001", "00010", "00100", "01000", "01000", "01000"],
+    '8': ["01110", "10001", "10001", "01110", "10001", "10001", "01110"],
+    '9': ["01110", "10001", "10001", "01111", "00001", "00010", "01100"],
+}
+
+GLYPH_SCALE = 4
+GLYPH_PADDING = 2
+
+
+class GlyphAtlas:
+    """
+    Текстура со всеми цифрами, растеризованными один раз.
+    Создается при текущем GL контексте.
+    """
+
+    def __init__(self, bitmaps=DIGIT_BITMAPS, scale=GLYPH_SCALE, padding=GLYPH_PADDING):
+        self.pixels, self.uv = self.rasterize(bitmaps, scale, padding)
+        rows, columns = len(next(iter(bitmaps.values()))), len(next(iter(bitmaps.values()))[0])
+        self.aspect = columns / rows
+
+        height, width = self.pixels.shape
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_ALPHA, width, height, 0, GL_ALPHA, GL_UNSIGNED_BYTE, self.pixels)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    @staticmethod
+    def rasterize(bitmaps, scale, padding):
+        """
+        Раскладывает глифы в одну строку атласа.
+
+        Returns:
+            pixels: uint8 массив (высота, ширина), ширина дополнена до степени двойки.
+            uv: словарь символ -> (u0, v0, u1, v1); v0 - низ глифа.
+        """
+        glyphs = {
+            char: np.kron(np.array([[c == '1' for c in row] for row in bitmap], dtype=np.uint8) * 255,
+                          np.ones((scale, scale), dtype=np.uint8))
+            for char, bitmap in bitmaps.items()
+        }
+        glyph_height, glyph_width = next(iter(glyphs.values())).shape
+        cell_width = glyph_width + 2 * padding
+        cell_height = glyph_height + 2 * padding
+
+        width = 1 << int(np.ceil(np.log2(cell_width * len(glyphs))))
+        height = 1 << int(np.ceil(np.log2(cell_height)))
+        pixels = np.zeros((height, width), dtype=np.uint8)
+
+        uv = {}
+        for i, (char, glyph) in enumerate(glyphs.items()):
+            x = i * cell_width + padding
+            # Строки текстуры идут снизу вверх, поэтому глиф переворачивается
+            pixels[padding:padding + glyph_height, x:x + glyph_width] = glyph[::-1]
+            uv[char] = (x / width, padding / height, (x + glyph_width) / width, (padding + glyph_height) / height)
+        return pixels, uv
+
+
+class TextBatch:
+    """
+    Все подписи сцены в одном буфере квадов.
+
+    Квады ориентированы векторами right/up (например, осями камеры).
+    Буфер пересобирается только при изменении подписей или ориентации.
+    """
+
+    CORNERS = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.labels = []
+        self.buffer = glGenBuffers(1)
+        self.vertex_count = 0
+        self.built_for = None
+
+    def clear(self):
+        if self.labels:
+            self.labels = []
+            self.built_for = None
+
+    def add(self, position, text, size):
+        """Добавляет подпись с центром в position; size - высота символа."""
+        self.labels.append((tuple(position), text, size))
+        self.built_for = None
+
+    def build(self, right, up):
+        """Возвращает float32 массив (4 * символов, 5): позиция xyz и текстурные координаты uv."""
+        anchors, offsets, sizes, uvs = [], [], [], []
+        for position, text, size in self.labels:
+            chars = [c for c in text if c in self.atlas.uv]
+            advance = size * self.atlas.aspect * 1.2
+            start = -advance * (len(chars) - 1) / 2
+            for i, char in enumerate(chars):
+                anchors.append(position)
+                offsets.append(start + i * advance)
+                sizes.append(size)
+                uvs.append(self.atlas.uv[char])
+
+        if not anchors:
+            return np.zeros((0, 5), dtype=np.float32)
+
+        anchors = np.array(anchors, dtype=np.float32)
+        offsets = np.array(offsets, dtype=np.float32)
+        sizes = np.array(sizes, dtype=np.float32)
+        uvs = np.array(uvs, dtype=np.float32)
+        right = np.asarray(right, dtype=np.float32)
+        up = np.asarray(up, dtype=np.float32)
+
+        widths = sizes * self.atlas.aspect
+        dx = offsets[:, np.newaxis] + (self.CORNERS[:, 0] - 0.5) * widths[:, np.newaxis]
+        dy = (self.CORNERS[:, 1] - 0.5) * sizes[:, np.newaxis]
+        positions = (anchors[:, np.newaxis, :]
+                     + dx[..., np.newaxis] * right
+                     + dy[..., np.newaxis] * up)
+
+        u = np.where(self.CORNERS[:, 0] == 0, uvs[:, [0]], uvs[:, [2]])
+        v = np.where(self.CORNERS[:, 1] == 0, uvs[:, [1]], uvs[:, [3]])
+        data = np.concatenate([positions, u[..., np.newaxis], v[..., np.newaxis]], axis=-1)
+        return np.ascontiguousarray(data.reshape(-1, 5), dtype=np.float32)
+
+    def draw(self, right=(1, 0, 0), up=(0, 1, 0), color=(1, 1, 1)):
+        key = (tuple(np.round(right, 5)), tuple(np.round(up, 5)))
+        if self.built_for != key:
+            data = self.build(right, up)
+            self.vertex_count = len(data)
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.built_for = key
+
+        if not self.vertex_count:
+            return
+
+        glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_COLOR_BUFFER_BIT | GL_TEXTURE_BIT)
+        glDisable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glEnable(GL_ALPHA_TEST)
+        glAlphaFunc(GL_GREATER, 0.1)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
+        glBindTexture(GL_TEXTURE_2D, self.atlas.texture)
+        glColor3f(*color)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 20, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, 20, ctypes.c_void_p(12))
+        glDrawArrays(GL_QUADS, 0, self.vertex_count)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPopAttrib()